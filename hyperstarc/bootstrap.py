@@ -0,0 +1,198 @@
+# bootstrap confidence intervals for fitted parameters
+#
+# resamples are never materialized: a replicate is a vector of multinomial
+# counts over the samples (or over the buckets of weighted input). for
+# Exponential and Erlang fits the counts are multiplied with the per-sample
+# sufficient statistics (x, x^2, log x), so a chunk of replicates is one
+# matrix product and all replicates are fitted with one vectorized call.
+# other fitters refit with the counts as sample weights.
+
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+
+import numpy as np
+from numpy.typing import NDArray
+from scipy.special import gammaincinv
+
+from .dist import AbcPhDist, Erlang, Exponential, HyperErlang
+from .dist_batch import DistBatch
+from .fitters import ErlangFitter, ExponentialFitter, Fitter, SampleStats
+
+DEFAULT_REPLICATES = 1000
+DEFAULT_QUANTILES = (0.99,)
+# replicates drawn per matrix product, bounds the memory of the count matrix
+CHUNK_CELLS = 2**22
+# replicates per task, each task has its own seed so the replicates do not
+# depend on the number of workers
+TASK_REPLICATES = 25
+
+
+@dataclass
+class Interval:
+    name: str
+    estimate: float
+    low: float
+    high: float
+
+
+@dataclass
+class BootstrapResult:
+    names: list[str]
+    estimate: NDArray
+    # one row per replicate, one column per name
+    replicates: NDArray
+
+    # percentile intervals of every parameter
+    def intervals(self, level: float = 0.95) -> list[Interval]:
+        if not 0 < level < 1:
+            raise ValueError("level must be in (0, 1)")
+        tail = (1 - level) / 2 * 100
+        low, high = np.nanpercentile(self.replicates, [tail, 100 - tail], axis=0)
+        return [
+            Interval(name, float(est), float(lo), float(hi))
+            for name, est, lo, hi in zip(self.names, self.estimate, low, high)
+        ]
+
+
+# per-process data, set once by the pool initializer
+_worker_data: dict = {}
+
+
+def _init_worker(values: NDArray, probs: NDArray | None, total: int) -> None:
+    _worker_data["values"] = values
+    _worker_data["probs"] = probs
+    _worker_data["total"] = total
+
+
+def _draw_counts(rng: np.random.Generator, size: int) -> NDArray:
+    values = _worker_data["values"]
+    probs = _worker_data["probs"]
+    total = _worker_data["total"]
+    n = values.shape[0]
+    if probs is None:
+        return np.stack([np.bincount(rng.integers(0, n, n), minlength=n) for _ in range(size)])
+    return rng.multinomial(total, probs, size=size)
+
+
+# stats of `size` replicates, values hold the columns 1, x, x^2, log x
+def _stats_task(seed: np.random.SeedSequence, size: int) -> NDArray:
+    rng = np.random.default_rng(seed)
+    values = _worker_data["values"]
+    step = max(1, CHUNK_CELLS // values.shape[0])
+    parts = []
+    for start in range(0, size, step):
+        counts = _draw_counts(rng, min(step, size - start)).astype(float)
+        parts.append(counts @ values)
+    return np.concatenate(parts)
+
+
+def _refit_task(seed: np.random.SeedSequence, size: int, fitter: Fitter) -> list[AbcPhDist]:
+    rng = np.random.default_rng(seed)
+    values = _worker_data["values"]
+    return [fitter.fit(values, counts.astype(float)) for counts in _draw_counts(rng, size)]
+
+
+def _param_names(dist: AbcPhDist) -> list[str]:
+    if isinstance(dist, Exponential):
+        return ["rate"]
+    if isinstance(dist, Erlang):
+        return ["rate", "phase"]
+    if isinstance(dist, HyperErlang):
+        names = []
+        for i in range(len(dist.branches)):
+            names += [f"prob{i}", f"rate{i}", f"phase{i}"]
+        return names
+    raise ValueError(f"cannot bootstrap {type(dist).__name__}")
+
+
+# parameters of a distribution, hyper-erlang branches are ordered by mean
+# so that replicates line up
+def _param_values(dist: AbcPhDist, size: int) -> list[float]:
+    if isinstance(dist, Exponential):
+        return [dist.rate]
+    if isinstance(dist, Erlang):
+        return [dist.rate, dist.phase]
+    res: list[float] = []
+    branches = sorted(dist.branches, key=lambda b: b.erlang.mean)  # type: ignore[attr-defined]
+    for b in branches:
+        res += [b.prob, b.erlang.rate, b.erlang.phase]
+    # replicates may find fewer clusters than the estimate
+    res += [np.nan] * (size - len(res))
+    return res[:size]
+
+
+def _split(replicates: int) -> list[int]:
+    full, rest = divmod(replicates, TASK_REPLICATES)
+    return [TASK_REPLICATES] * full + ([rest] if rest else [])
+
+
+# bootstrap a fitter on samples (optionally weighted, e.g. histogram counts),
+# intervals cover the fitted parameters, the mean and the given quantiles
+def bootstrap(
+    fitter: Fitter,
+    samples: NDArray,
+    weights: NDArray | None = None,
+    replicates: int = DEFAULT_REPLICATES,
+    quantiles: tuple[float, ...] = DEFAULT_QUANTILES,
+    workers: int | None = None,
+    seed: int | None = None,
+) -> BootstrapResult:
+    if samples.ndim != 1:
+        raise ValueError("samples must be 1-dimentional")
+    if replicates < 1:
+        raise ValueError("replicates must be positive")
+    estimate = fitter.fit(samples, weights)
+    names = _param_names(estimate) + ["mean"] + [f"p{q * 100:g}" for q in quantiles]
+    probs, total = None, samples.size
+    if weights is not None:
+        total = int(round(float(np.sum(weights))))
+        probs = np.asarray(weights, dtype=float) / np.sum(weights)
+
+    stats_fit = isinstance(fitter, (ExponentialFitter, ErlangFitter))
+    if stats_fit:
+        values = np.column_stack([np.ones(samples.size), samples, samples * samples, np.log(samples)])
+    else:
+        values = samples
+    sizes = _split(replicates)
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    if workers == 1:
+        _init_worker(values, probs, total)
+        if stats_fit:
+            parts = [_stats_task(s, n) for s, n in zip(seeds, sizes)]
+        else:
+            parts = [_refit_task(s, n, fitter) for s, n in zip(seeds, sizes)]
+    else:
+        with ProcessPoolExecutor(
+            max_workers=workers, initializer=_init_worker, initargs=(values, probs, total)
+        ) as pool:
+            if stats_fit:
+                futures = [pool.submit(_stats_task, s, n) for s, n in zip(seeds, sizes)]
+            else:
+                futures = [pool.submit(_refit_task, s, n, fitter) for s, n in zip(seeds, sizes)]
+            parts = [f.result() for f in futures]
+
+    q = np.asarray(quantiles, dtype=float)
+    if stats_fit:
+        sums = np.concatenate(parts)
+        stats = SampleStats(sums[:, 0], sums[:, 1], sums[:, 2], sums[:, 3])
+        if isinstance(fitter, ErlangFitter):
+            rate, phase = fitter.fit_params(stats)
+            columns = [rate, phase]
+        else:
+            rate = fitter.fit_params(stats)
+            phase = np.ones_like(rate)
+            columns = [rate]
+        # erlang quantiles in closed form
+        quants = gammaincinv(phase[:, None], q[None, :]) / rate[:, None]
+        table = np.column_stack(columns + [phase / rate, quants])
+    else:
+        dists = [dist for part in parts for dist in part]
+        n_params = len(names) - 1 - q.size
+        params = np.array([_param_values(d, n_params) for d in dists])
+        batch = DistBatch.from_dists(dists)
+        table = np.column_stack([params, batch.mean(), batch.quantile(q)])
+
+    point = DistBatch.from_dists([estimate])
+    est = _param_values(estimate, len(names) - 1 - q.size)
+    est += [estimate.mean] + point.quantile(q)[0].tolist()
+    return BootstrapResult(names, np.array(est, dtype=float), table)
@@ -0,0 +1,73 @@
+# fit every column of a multi-column sample file with one fitter
+
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+
+import numpy as np
+from numpy.typing import NDArray
+
+from . import gof, serialize
+from .dist import AbcPhDist
+from .fitters import Fitter
+
+COLUMN_HEADERS = ["column", "model"] + gof.REPORT_HEADERS[1:]
+
+
+@dataclass
+class ColumnFit:
+    column: str
+    dist: AbcPhDist
+    gof: gof.GofResult
+
+
+# parse a selection such as "0, 2, 5" into column indices, empty or "all"
+# selects every column
+def parse_columns(text: str, n_columns: int) -> list[int]:
+    text = text.strip()
+    if text in ("", "all"):
+        return list(range(n_columns))
+    try:
+        res = [int(item) for item in text.split(",") if item.strip()]
+    except ValueError:
+        raise ValueError(f"bad column selection: {text}")
+    for idx in res:
+        if idx < 0 or idx >= n_columns:
+            raise ValueError(f"column {idx} out of range")
+    return res
+
+
+def _fit_column(name: str, samples: NDArray, fitter: Fitter, bins: int) -> ColumnFit:
+    dist = fitter.fit(samples)
+    (res,) = gof.evaluate(samples, {name: dist}, bins=bins, workers=1)
+    return ColumnFit(name, dist, res)
+
+
+# fit the selected columns of a 2-D sample array in a process pool,
+# results keep the column order
+def fit_columns(
+    samples: NDArray,
+    fitter: Fitter,
+    columns: list[int] | None = None,
+    bins: int = gof.DEFAULT_BINS,
+    workers: int | None = None,
+) -> list[ColumnFit]:
+    if samples.ndim != 2:
+        raise ValueError("samples must be 2-dimentional")
+    if columns is None:
+        columns = list(range(samples.shape[1]))
+    jobs = [(f"col{idx}", np.ascontiguousarray(samples[:, idx]), fitter, bins) for idx in columns]
+    if workers == 1 or len(jobs) == 1:
+        return [_fit_column(*job) for job in jobs]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(_fit_column, *job) for job in jobs]
+        return [f.result() for f in futures]
+
+
+def to_rows(results: list[ColumnFit]) -> list[list]:
+    return [[r.column, str(r.dist)] + gof.to_rows([r.gof])[0][1:] for r in results]
+
+
+# write all fitted column models into one model file
+def export(results: list[ColumnFit], path: str | Path) -> None:
+    serialize.save_models(path, {r.column: r.dist for r in results})
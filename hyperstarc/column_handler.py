@@ -0,0 +1,43 @@
+import logging
+import tempfile
+from pathlib import Path
+
+import gradio as gr
+
+from . import column_fit, config
+from .config import Parameters
+from .fit_handler import make_fitter
+
+logger = logging.getLogger(__name__)
+
+
+# event handler for column selection
+def columns_change(text: str, params: Parameters) -> Parameters:
+    params.fit_columns = text
+    return params
+
+
+# event handler for fit columns button, returns the result table and
+# the path of the combined model file
+def fit_columns_click(params: Parameters) -> tuple[list[list], str | None]:
+    if params.samples_columns is None:
+        logger.error("No multi-column samples loaded")
+        gr.Warning("No multi-column samples loaded", duration=config.msg_duration)
+        return [], None
+    fitter = make_fitter(params)
+    if fitter is None:
+        logger.error("No fitter selected")
+        gr.Warning("No fitter selected", duration=config.msg_duration)
+        return [], None
+    try:
+        columns = column_fit.parse_columns(params.fit_columns, params.samples_columns.shape[1])
+    except ValueError as e:
+        logger.error(str(e))
+        gr.Warning(str(e), duration=config.msg_duration)
+        return [], None
+    results = column_fit.fit_columns(
+        params.samples_columns, fitter, columns=columns, bins=params.draw_hist_bins
+    )
+    fpath = Path(tempfile.mkdtemp()) / "columns.json"
+    column_fit.export(results, fpath)
+    return column_fit.to_rows(results), str(fpath)
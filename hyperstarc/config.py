@@ -1,10 +1,16 @@
 import enum
 from dataclasses import dataclass
 import logging
+from typing import TYPE_CHECKING
 
 import matplotlib.pyplot as plt
 from numpy.typing import NDArray
 
+from .dist import AbcPhDist
+
+if TYPE_CHECKING:
+    from .fitters import FitCache
+
 LOG_LEVEL = logging.DEBUG
 msg_duration = 5
 
@@ -44,6 +50,8 @@ class ROUNDING(enum.Enum):
     round = "round"
     ceil = "ceil"
     floor = "floor"
+    # integer phase with the highest likelihood
+    exact = "exact"
 
 
 RUNDING_NAMES = [rounding.name for rounding in ROUNDING]
@@ -54,6 +62,8 @@ class Parameters:
     samples_all: NDArray | None = None
     samples_plot: NDArray | None = None
     samples_plot_num: int = 1000
+    samples_columns: NDArray | None = None
+    fit_columns: str = ""
 
     draw_hist_bins: int = 200
     draw_max_bins: int = 1000
@@ -68,8 +78,16 @@ class Parameters:
     herlang_peaks: int = 2
     herlang_max_phase: int = 1000
     herlang_method: ERMD = ERMD.MLE
-    herlang_rounding: ROUNDING = ROUNDING.round
+    herlang_rounding: ROUNDING = ROUNDING.exact
+    # total phases of all branches, 0 for no limit
+    herlang_phase_budget: int = 0
+
+    window_size: int = 1000
+    window_stride: int = 100
 
     fitter_selected: FITTERS = FITTERS.Exponential
+    dist: AbcPhDist | None = None
+    # intermediate fit state of samples_all, reused by refits
+    fit_cache: "FitCache | None" = None
 
 default_param = Parameters()
\ No newline at end of file
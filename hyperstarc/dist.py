@@ -3,8 +3,12 @@ from abc import ABC, abstractmethod
 from typing import Tuple
 
 import numpy as np
-from numpy.typing import NDArray
-from scipy import linalg
+from numpy.typing import ArrayLike, NDArray
+from scipy import linalg, sparse
+from scipy.sparse.linalg import splu
+from scipy.special import gammainc, gammaln, xlogy
+
+from . import ph_eval
 
 
 class AbcPhDist(ABC):
@@ -40,12 +44,22 @@ class AbcPhDist(ABC):
     def cdf(self, x: float) -> float:
         pass
 
+    # pdf over an array of points
+    def pdfs(self, x: ArrayLike) -> NDArray:
+        x = np.asarray(x, dtype=float)
+        return np.array([self.pdf(v) for v in x.ravel()]).reshape(x.shape)
+
+    # cdf over an array of points
+    def cdfs(self, x: ArrayLike) -> NDArray:
+        x = np.asarray(x, dtype=float)
+        return np.array([self.cdf(v) for v in x.ravel()]).reshape(x.shape)
+
     def llh(self, samples: NDArray) -> float:
         if not np.squeeze(samples).ndim == 1:
             raise ValueError("samples must be 1-dimentional")
-        lh = map(self.pdf, samples)
+        lh = map(self.pdf, np.squeeze(samples))
         llh = map(math.log, lh)
-        return math.prod(llh)
+        return math.fsum(llh)
 
     @abstractmethod
     def __repr__(self) -> str:
@@ -78,6 +92,14 @@ class Exponential(AbcPhDist):
         res = 1 - math.exp(-self.rate * x)
         return res * (x >= 0)
 
+    def pdfs(self, x: ArrayLike) -> NDArray:
+        x = np.asarray(x, dtype=float)
+        return np.where(x >= 0, self.rate * np.exp(-self.rate * np.maximum(x, 0)), 0.0)
+
+    def cdfs(self, x: ArrayLike) -> NDArray:
+        x = np.asarray(x, dtype=float)
+        return -np.expm1(-self.rate * np.maximum(x, 0))
+
     def __repr__(self) -> str:
         return f"Exponential(rate={self.rate})"
 
@@ -129,7 +151,20 @@ class Erlang(AbcPhDist):
             res[i, i + 1] = self.rate
         res[self.phase - 1, self.phase - 1] = -self.rate
         return res
-    
+
+    # pdf in log space, so that large phases do not overflow
+    def pdfs(self, x: ArrayLike) -> NDArray:
+        x = np.asarray(x, dtype=float)
+        k, r = self.phase, self.rate
+        with np.errstate(divide="ignore", invalid="ignore"):
+            log_f = k * np.log(r) + xlogy(k - 1, x) - r * x - gammaln(k)
+            return np.where(x >= 0, np.exp(log_f), 0.0)
+
+    # cdf is the regularized lower incomplete gamma function
+    def cdfs(self, x: ArrayLike) -> NDArray:
+        x = np.asarray(x, dtype=float)
+        return gammainc(self.phase, self.rate * np.maximum(x, 0))
+
     def __repr__(self) -> str:
         return f"Erlang(rate={self.rate}, phase={self.phase})"
 
@@ -177,13 +212,13 @@ class HyperErlang(AbcPhDist):
         if int(k) != k or k < 1:
             raise ValueError("k must be integer and greater than 0")
 
+        # E[X^k] = k! \alpha (-T)^{-k} 1
         trans = self.get_trans_matrix()
         dim = trans.shape[0]
         d0inv = np.linalg.inv(-trans)
-        res = self.get_alpha()
-        res = np.expand_dims(res, -1) * d0inv**k
-        res = res @ np.ones((dim, 1))
-        return res[0, 0] * math.factorial(k)
+        res = self.get_alpha() @ np.linalg.matrix_power(d0inv, k)
+        res = res @ np.ones(dim)
+        return float(res) * math.factorial(k)
 
     # f(x) = \sum_{i=1}^N p_i \cdot
     # \frac{\lambda_i^{k_i} x^{k_i - 1} e^{-\lambda_i x}}
@@ -204,6 +239,12 @@ class HyperErlang(AbcPhDist):
             res += self.cdf_branch(branch, x)
         return 1 - res
 
+    def pdfs(self, x: ArrayLike) -> NDArray:
+        return sum(branch.prob * branch.erlang.pdfs(x) for branch in self.branches)
+
+    def cdfs(self, x: ArrayLike) -> NDArray:
+        return sum(branch.prob * branch.erlang.cdfs(x) for branch in self.branches)
+
     def cdf_branch(self, branch: HyperErlangBranch, x: float) -> float:
         temp, res = 0.0, 0.0
         for i in range(branch.erlang.phase):
@@ -215,7 +256,60 @@ class HyperErlang(AbcPhDist):
         return res * branch.prob
     
     def __repr__(self) -> str:
-        return f"HyperErlang(\n{[str(branch)+"\n" for branch in self.branches]})"
+        branches = ",\n".join(str(branch) for branch in self.branches)
+        return f"HyperErlang(\n{branches}\n)"
+
+
+# general phase-type distribution with initial vector alpha and
+# sub-generator trans, trans may be a scipy sparse matrix
+class PhaseType(AbcPhDist):
+    def __init__(self, alpha: NDArray, trans: NDArray | sparse.spmatrix):
+        alpha = np.asarray(alpha, dtype=float).ravel()
+        if len(trans.shape) != 2 or trans.shape != (alpha.size, alpha.size):
+            raise ValueError("trans must be a square matrix matching alpha")
+        if np.any(alpha < 0) or alpha.sum() > 1 + 1e-9:
+            raise ValueError("alpha must be a sub-stochastic vector")
+        self._alpha = alpha
+        self._trans = trans
+        self.phase = alpha.size
+        super().__init__()
+
+    def get_alpha(self) -> NDArray:
+        return self._alpha
+
+    def get_trans_matrix(self) -> NDArray | sparse.spmatrix:
+        return self._trans
+
+    # E[X^k] = k! \alpha (-T)^{-k} 1
+    def _calcMoment(self, k: int) -> float:
+        if int(k) != k or k < 1:
+            raise ValueError("k must be integer and greater than 0")
+        res = np.ones(self.phase)
+        if sparse.issparse(self._trans):
+            lu = splu(sparse.csc_matrix(-self._trans))
+            for _ in range(k):
+                res = lu.solve(res)
+        else:
+            lu = linalg.lu_factor(-self._trans)
+            for _ in range(k):
+                res = linalg.lu_solve(lu, res)
+        return float(self._alpha @ res) * math.factorial(k)
+
+    def pdf(self, x: float) -> float:
+        return float(self.pdfs([x])[0])
+
+    def cdf(self, x: float) -> float:
+        return float(self.cdfs([x])[0])
+
+    def pdfs(self, x: ArrayLike) -> NDArray:
+        return ph_eval.grid_eval(self._alpha, self._trans, x)[0]
+
+    def cdfs(self, x: ArrayLike) -> NDArray:
+        return ph_eval.grid_eval(self._alpha, self._trans, x)[1]
+
+    def __repr__(self) -> str:
+        trans = self._trans.toarray() if sparse.issparse(self._trans) else self._trans
+        return f"PhaseType(alpha={self._alpha.tolist()}, trans={np.asarray(trans).tolist()})"
 
 
 class MAP(AbcPhDist):
@@ -231,21 +325,30 @@ class MAP(AbcPhDist):
         self._d1 = d1
         self._dim = d0.shape[0]
         # for computing
-        self._d0inv = np.linalg.inv(d0)
-        # embedded process
+        self._d0inv = np.linalg.inv(-d0)
+        # embedded process at arrivals
         self._P = self._d0inv @ d1
-        # steady probability of P
-        # TODO : check if P is stable
-        self._limit_prob = self._P**1000
+        # limit of P^n, every row is the stationary vector of P
+        self._pi = self._stationary(self._P)
+        self._limit_prob = np.outer(np.ones(self._dim), self._pi)
         super().__init__()
 
+    # solve pi P = pi, pi 1 = 1
+    @staticmethod
+    def _stationary(p: NDArray) -> NDArray:
+        dim = p.shape[0]
+        lhs = np.vstack([(p - np.eye(dim)).T, np.ones((1, dim))])
+        rhs = np.zeros(dim + 1)
+        rhs[-1] = 1
+        return np.linalg.lstsq(lhs, rhs, rcond=None)[0]
+
     def _calcMoment(self, k: int) -> float:
         if int(k) != k or k < 1:
             raise ValueError("k must be integer and greater than 0")
 
-        res = self._limit_prob @ (self._d0inv**k) @ np.ones((self._dim, 1))
-        res = res * math.factorial(k)
-        return res[0, 0]
+        # E[X^k] = k! \pi (-D_0)^{-k} 1
+        res = self._pi @ np.linalg.matrix_power(self._d0inv, k) @ np.ones(self._dim)
+        return float(res) * math.factorial(k)
 
     def get_trans_matrix(self) -> Tuple[NDArray, NDArray]:
         return (self._d0, self._d1)
@@ -253,23 +356,30 @@ class MAP(AbcPhDist):
     def get_limit_prob(self) -> NDArray:
         return self._limit_prob
 
+    # the stationary inter-arrival time is phase-type (pi, D_0)
     def pdf(self, x: float) -> float:
-        res = -self._d0 @ np.ones((self._dim, 1))
-        res = self._limit_prob @ (linalg.expm(self._d0 * x)) @ res
-        return res[0, 0]
+        return float(self.pdfs([x])[0])
 
     def cdf(self, x: float) -> float:
-        res = self._limit_prob @ (linalg.expm(self._d0 * x)) @ np.ones((self._dim, 1))
-        res = 1 - res[0, 0]
-        return res
+        return float(self.cdfs([x])[0])
+
+    def pdfs(self, x: ArrayLike) -> NDArray:
+        return ph_eval.grid_eval(self._pi, self._d0, x)[0]
+
+    def cdfs(self, x: ArrayLike) -> NDArray:
+        return ph_eval.grid_eval(self._pi, self._d0, x)[1]
 
     def acf(self, k: int) -> float:
         m_mean = (
-            self._limit_prob
+            self._pi
             @ self._d0inv
-            @ (self._P**k)
+            @ np.linalg.matrix_power(self._P, k)
             @ self._d0inv
-            * np.ones((self._dim, 1))
+            @ np.ones(self._dim)
         )
-        cov = m_mean[0, 0] - self.mean**2
+        cov = float(m_mean) - self.mean**2
         return cov / self.var
+
+    def __repr__(self) -> str:
+        return f"MAP(d0={self._d0.tolist()}, d1={self._d1.tolist()})"
+
@@ -0,0 +1,182 @@
+# structure-of-arrays view of many fitted distributions
+#
+# Exponential, Erlang and HyperErlang models are all mixtures of Erlang
+# branches, so a collection of them is stored as flat branch arrays
+# (prob, rate, phase) plus per-model offsets. pdf/cdf/quantile are then
+# evaluated for every model at once. MAP and general PhaseType models have
+# no such form and are kept as objects.
+
+from collections.abc import Iterable, Mapping
+
+import numpy as np
+from numpy.typing import ArrayLike, NDArray
+from scipy.special import gammainc, gammaln, xlogy
+
+from .dist import (MAP, AbcPhDist, Erlang, Exponential, HyperErlang,
+                   HyperErlangBranch, PhaseType)
+
+QUANTILE_ITERATIONS = 100
+
+
+class DistBatch:
+    def __init__(
+        self,
+        ids: list[str],
+        types: list[str],
+        offsets: NDArray,
+        prob: NDArray,
+        rate: NDArray,
+        phase: NDArray,
+        others: dict[int, AbcPhDist] | None = None,
+    ) -> None:
+        if len(ids) != len(types) or len(offsets) != len(ids) + 1:
+            raise ValueError("ids, types and offsets do not match")
+        if not prob.shape == rate.shape == phase.shape:
+            raise ValueError("branch arrays must have the same shape")
+        self.ids = list(ids)
+        self.types = list(types)
+        self.offsets = np.asarray(offsets, dtype=np.int64)
+        self.prob = np.asarray(prob, dtype=float)
+        self.rate = np.asarray(rate, dtype=float)
+        self.phase = np.asarray(phase, dtype=np.int64)
+        self.others = dict(others or {})
+        counts = np.diff(self.offsets)
+        # models made of erlang branches and the model owning each branch
+        self._ph_models = np.flatnonzero(counts > 0)
+        self._owner = np.repeat(np.arange(len(self.ids)), counts)
+
+    @classmethod
+    def from_dists(
+        cls, dists: Mapping[str, AbcPhDist] | Iterable[AbcPhDist]
+    ) -> "DistBatch":
+        if isinstance(dists, Mapping):
+            items = list(dists.items())
+        else:
+            items = [(str(i), dist) for i, dist in enumerate(dists)]
+        ids, types, counts = [], [], []
+        prob, rate, phase = [], [], []
+        others: dict[int, AbcPhDist] = {}
+        for idx, (key, dist) in enumerate(items):
+            ids.append(key)
+            types.append(type(dist).__name__)
+            if isinstance(dist, Exponential):
+                branches = [(1.0, dist.rate, 1)]
+            elif isinstance(dist, Erlang):
+                branches = [(1.0, dist.rate, dist.phase)]
+            elif isinstance(dist, HyperErlang):
+                branches = [(b.prob, b.erlang.rate, b.erlang.phase) for b in dist.branches]
+            elif isinstance(dist, (MAP, PhaseType)):
+                others[idx] = dist
+                branches = []
+            else:
+                raise ValueError(f"unsupported distribution {type(dist).__name__}")
+            counts.append(len(branches))
+            for p, r, k in branches:
+                prob.append(p)
+                rate.append(r)
+                phase.append(k)
+        offsets = np.concatenate([[0], np.cumsum(counts, dtype=np.int64)])
+        return cls(
+            ids,
+            types,
+            offsets,
+            np.array(prob, dtype=float),
+            np.array(rate, dtype=float),
+            np.array(phase, dtype=np.int64),
+            others,
+        )
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    # rebuild distribution objects, keyed by model id
+    def to_dists(self) -> dict[str, AbcPhDist]:
+        res: dict[str, AbcPhDist] = {}
+        for idx, key in enumerate(self.ids):
+            if idx in self.others:
+                res[key] = self.others[idx]
+                continue
+            lo, hi = self.offsets[idx], self.offsets[idx + 1]
+            kind = self.types[idx]
+            if kind == "Exponential":
+                res[key] = Exponential(float(self.rate[lo]))
+            elif kind == "Erlang":
+                res[key] = Erlang(float(self.rate[lo]), int(self.phase[lo]))
+            else:
+                branches = [
+                    HyperErlangBranch(Erlang(float(self.rate[i]), int(self.phase[i])), float(self.prob[i]))
+                    for i in range(lo, hi)
+                ]
+                res[key] = HyperErlang(branches)
+        return res
+
+    # mean of every model
+    def mean(self) -> NDArray:
+        res = np.zeros(len(self))
+        if self._ph_models.size:
+            part = self.prob * self.phase / self.rate
+            res[self._ph_models] = np.add.reduceat(part, self.offsets[self._ph_models])
+        for idx, dist in self.others.items():
+            res[idx] = dist.mean
+        return res
+
+    # x is a shared grid of shape (G,) or one grid per model of shape (M, G),
+    # the result has shape (M, G)
+    def pdf(self, x: ArrayLike) -> NDArray:
+        return self._evaluate(x, self._branch_pdf, "pdfs")
+
+    def cdf(self, x: ArrayLike) -> NDArray:
+        return self._evaluate(x, self._branch_cdf, "cdfs")
+
+    # quantiles of every model by vectorized bisection, result has shape (M, Q)
+    def quantile(self, q: ArrayLike) -> NDArray:
+        q = np.atleast_1d(np.asarray(q, dtype=float))
+        if q.ndim != 1:
+            raise ValueError("q must be a scalar or 1-dimentional")
+        if np.any((q < 0) | (q >= 1)):
+            raise ValueError("q must be in [0, 1)")
+        target = np.broadcast_to(q, (len(self), q.size))
+        lo = np.zeros(target.shape)
+        hi = np.broadcast_to(2 * self.mean()[:, None], target.shape).copy()
+        # widen the bracket until it holds every quantile
+        for _ in range(64):
+            low = self.cdf(hi) < target
+            if not low.any():
+                break
+            hi[low] *= 2
+        for _ in range(QUANTILE_ITERATIONS):
+            mid = (lo + hi) / 2
+            below = self.cdf(mid) < target
+            lo = np.where(below, mid, lo)
+            hi = np.where(below, hi, mid)
+        return (lo + hi) / 2
+
+    def _evaluate(self, x: ArrayLike, branch_fn, name: str) -> NDArray:
+        x = np.asarray(x, dtype=float)
+        if x.ndim == 1:
+            grid = np.broadcast_to(x, (len(self), x.size))
+        elif x.ndim == 2 and x.shape[0] == len(self):
+            grid = x
+        else:
+            raise ValueError("x must have shape (G,) or (models, G)")
+        res = np.zeros(grid.shape)
+        if self._ph_models.size:
+            per_branch = branch_fn(grid[self._owner]) * self.prob[:, None]
+            res[self._ph_models] = np.add.reduceat(per_branch, self.offsets[self._ph_models], axis=0)
+        for idx, dist in self.others.items():
+            res[idx] = getattr(dist, name)(grid[idx])
+        return res
+
+    # f(x) = \frac{\lambda^k x^{k-1} e^{-\lambda x}}{(k-1)!}, evaluated in log space
+    def _branch_pdf(self, x: NDArray) -> NDArray:
+        k = self.phase[:, None]
+        r = self.rate[:, None]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            log_f = k * np.log(r) + xlogy(k - 1, x) - r * x - gammaln(k)
+            return np.where(x >= 0, np.exp(log_f), 0.0)
+
+    # F(x) is the regularized lower incomplete gamma function
+    def _branch_cdf(self, x: NDArray) -> NDArray:
+        k = self.phase[:, None]
+        r = self.rate[:, None]
+        return gammainc(k, r * np.maximum(x, 0.0))
@@ -6,27 +6,28 @@ from matplotlib.figure import Figure
 import tempfile
 from pathlib import Path
 
-from . import config
+from . import config, gof, serialize
 from .config import Parameters
-from .fitters import ErlangFitter, ExponentialFitter, Fitter, HyperErlangFitter
+from .dist import AbcPhDist
+from .fitters import ErlangFitter, ExponentialFitter, FitCache, Fitter, HyperErlangFitter
+from .phase_budget import PhaseBudgetFitter
 from .plot_handler import gen_hist, gen_sa_cdf
 
 logger = logging.getLogger(__name__)
 
-def _make_dist_file(dist_str: str) -> str:
-    # create a temp .txt file and return its path
+def _make_dist_file(dist: AbcPhDist) -> str:
+    # create a temp .json file and return its path
     tmp_dir = Path(tempfile.mkdtemp())
-    fname = dist_str.split("(")[0]
-    fpath = tmp_dir / f"{fname}.txt"
-    fpath.write_text(dist_str, encoding="utf-8")
+    fname = type(dist).__name__
+    fpath = tmp_dir / f"{fname}.json"
+    fpath.write_text(serialize.dumps(dist), encoding="utf-8")
     return str(fpath)
 # event handler for export button
 def export_click(params: Parameters)->str:
     if params.dist is None:
         logger.error("No distribution fitted")
         return "No distribution fitted"
-    dist_str = str(params.dist)
-    return _make_dist_file(dist_str)
+    return _make_dist_file(params.dist)
 
 # event handler for fit button
 def fit_click(params: Parameters)->tuple[Figure, Figure, Parameters]:
@@ -41,7 +42,7 @@ def fit_click(params: Parameters)->tuple[Figure, Figure, Parameters]:
         return no_figs
     params.dist = None
     dist = fitter.fit(params.samples_all)
-    params.dist = str(dist)
+    params.dist = dist
     pdf_fig = gen_hist(params.samples_plot, params)
     cdf_fig = gen_sa_cdf(params.samples_plot, params)
     if params.samples_plot is not None:
@@ -52,13 +53,13 @@ def fit_click(params: Parameters)->tuple[Figure, Figure, Parameters]:
         smp_max = np.max(params.samples_all)
     x = np.linspace(smp_min, smp_max, 100)
     if pdf_fig is not None:
-        y = [dist.pdf(i) for i in x]
+        y = dist.pdfs(x)
         ax2 = pdf_fig.axes[0].twinx()
         ax2.plot(x, y, color="blue")
         ax2.set_ylabel("pdf", color="blue")
         pdf_fig.tight_layout()
     if cdf_fig is not None:
-        y = [dist.cdf(i) for i in x]
+        y = dist.cdfs(x)
         ax2 = cdf_fig.axes[0].twinx()
         ax2.plot(x, y, color="blue")
         ax2.set_ylabel("cdf", color="blue")
@@ -66,6 +67,26 @@ def fit_click(params: Parameters)->tuple[Figure, Figure, Parameters]:
     return pdf_fig, cdf_fig, params
 
 
+# event handler for compare button, fits every distribution and
+# keeps the one with the best goodness of fit
+def compare_click(params: Parameters) -> tuple[list[list], Parameters]:
+    if params.samples_all is None:
+        logger.error("No samples loaded")
+        gr.Warning("No samples loaded", duration=config.msg_duration)
+        return [], params
+    fitters = {}
+    for selected in config.FITTERS:
+        fitter = make_fitter(params, selected)
+        if fitter is not None:
+            fitters[selected.name] = fitter
+    dists, results = gof.compare_fitters(
+        params.samples_all, fitters, bins=params.draw_hist_bins
+    )
+    params.dist = dists[results[0].name]
+    logger.info(f"best fit: {params.dist}")
+    return gof.to_rows(results), params
+
+
 # Update ui based on selected fitter
 def fitter_change(fitter: str, params: Parameters)->list:
     res = [gr.update(visible=False) for _ in config.FITTER_NAMES]
@@ -81,20 +102,36 @@ def fitter_change(fitter: str, params: Parameters)->list:
 
 
 # generate fitter object based on selected fitter
-def make_fitter(params: Parameters) -> Fitter | None:
-    if params.fitter_selected == config.FITTERS.Exponential:
-        return ExponentialFitter()
-    if params.fitter_selected == config.FITTERS.Erlang:
+def make_fitter(
+    params: Parameters, selected: config.FITTERS | None = None
+) -> Fitter | None:
+    if selected is None:
+        selected = params.fitter_selected
+    # fitters share the state of the loaded samples across refits
+    if params.fit_cache is None:
+        params.fit_cache = FitCache()
+    cache = params.fit_cache
+    if selected == config.FITTERS.Exponential:
+        return ExponentialFitter(cache=cache)
+    if selected == config.FITTERS.Erlang:
         return ErlangFitter(
             method=params.erlang_method,
             rounding=params.erlang_rounding,
             max_phase=params.erlang_max_phase,
+            cache=cache,
         )
-    if params.fitter_selected == config.FITTERS.HyperErlang:
+    if selected == config.FITTERS.HyperErlang and params.herlang_phase_budget > 0:
+        return PhaseBudgetFitter(
+            budget=params.herlang_phase_budget,
+            peaks=params.herlang_peaks,
+            max_phase=params.herlang_max_phase,
+            cache=cache,)
+    if selected == config.FITTERS.HyperErlang:
         return HyperErlangFitter(
             peaks=params.herlang_peaks,
             method=params.herlang_method,
             rounding=params.herlang_rounding,
-            max_phase=params.herlang_max_phase,)
+            max_phase=params.herlang_max_phase,
+            cache=cache,)
     return None
 
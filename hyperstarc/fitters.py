@@ -1,7 +1,11 @@
+import hashlib
+import threading
 from abc import ABC, abstractmethod
+from dataclasses import dataclass
 
 import numpy as np
 from numpy.typing import NDArray
+from scipy.special import gammaln, xlogy
 from sklearn.cluster import KMeans
 
 from .config import ERMD, ROUNDING
@@ -9,28 +13,257 @@ from .dist import AbcPhDist, Erlang, Exponential, HyperErlang, HyperErlangBranch
 from . import config
 
 
-class Fitter(ABC):
+# cells (rows x max_phase) of the profile likelihood table evaluated at once
+# by the exact phase search
+EXACT_CHUNK_CELLS = 2**22
+
+
+# sufficient statistics of (weighted) samples for exponential and erlang fits,
+# the fields are floats for one sample set or arrays for many
+@dataclass
+class SampleStats:
+    count: float
+    total: float
+    total_sq: float
+    total_log: float
+
+    @classmethod
+    def from_samples(
+        cls, samples: NDArray, weights: NDArray | None = None
+    ) -> "SampleStats":
+        if weights is None:
+            return cls(
+                float(samples.size),
+                float(np.sum(samples)),
+                float(np.dot(samples, samples)),
+                float(np.sum(np.log(samples))),
+            )
+        return cls(
+            float(np.sum(weights)),
+            float(np.dot(weights, samples)),
+            float(np.dot(weights, samples * samples)),
+            float(np.dot(weights, np.log(samples))),
+        )
+
+    # statistics of every group in one pass over the samples,
+    # labels[i] in [0, n_groups) is the group of samples[i]
+    @classmethod
+    def grouped(
+        cls,
+        samples: NDArray,
+        labels: NDArray,
+        n_groups: int,
+        weights: NDArray | None = None,
+        log_samples: NDArray | None = None,
+    ) -> "SampleStats":
+        if log_samples is None:
+            log_samples = np.log(samples)
+        if weights is None:
+            count = np.bincount(labels, minlength=n_groups).astype(float)
+            w_samples, w_logs = samples, log_samples
+        else:
+            count = np.bincount(labels, weights=weights, minlength=n_groups)
+            w_samples, w_logs = weights * samples, weights * log_samples
+        return cls(
+            count,
+            np.bincount(labels, weights=w_samples, minlength=n_groups),
+            np.bincount(labels, weights=w_samples * samples, minlength=n_groups),
+            np.bincount(labels, weights=w_logs, minlength=n_groups),
+        )
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count
+
+    @property
+    def var(self) -> float:
+        return np.maximum(self.total_sq / self.count - self.mean**2, 0.0)
+
+    @property
+    def mean_log(self) -> float:
+        return self.total_log / self.count
+
+
+# per-sample erlang log-likelihood for phases 1..max_phase with rate = k / mean,
+# l(k) / n = k log(k / mean) + (k - 1) mean_log - k - log((k - 1)!)
+# only needs the mean and mean log, so the cost does not depend on the
+# number of samples. one row per (log_mean, mean_log) pair.
+def profile_llh(log_mean: NDArray, mean_log: NDArray, max_phase: int) -> NDArray:
+    k = np.arange(1, max_phase + 1, dtype=float)
+    const = xlogy(k, k) - k - gammaln(k)
+    return const - np.outer(log_mean, k) + np.outer(mean_log, k - 1)
+
+
+# arrays that cannot be modified in place
+def _frozen(*arrays: NDArray | None) -> bool:
+    return all(a is None or not a.flags.writeable for a in arrays)
+
+
+# digest of the values and their order
+def _fingerprint(samples: NDArray, weights: NDArray | None) -> bytes:
+    digest = hashlib.blake2b(digest_size=16)
+    for values in (samples, weights):
+        if values is not None:
+            values = np.ascontiguousarray(values, dtype=float)
+            digest.update(str(values.shape).encode())
+            digest.update(values.data)
+        digest.update(b"|")
+    return digest.digest()
+
+
+# clustering of one sample set into a number of peaks, labels and stats
+# cover every cluster including empty ones
+@dataclass
+class ClusterState:
+    centers: NDArray
+    labels: NDArray
+    stats: SampleStats
+
+
+# per-dataset state reused by refits of the same samples, e.g. when only
+# the rounding, the max phase or the number of peaks changes between fits.
+# samples are matched by content, an array that is modified in place (e.g.
+# shuffled) no longer matches and the state is rebuilt. read-only arrays
+# cannot change, they are matched by identity and hashed only once.
+# fitters sharing a cache may fit the same samples concurrently.
+class FitCache:
     def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.samples: NDArray | None = None
+        self.weights: NDArray | None = None
+        self._key: bytes | None = None
+        self._log_samples: NDArray | None = None
+        self._stats: SampleStats | None = None
+        # number of peaks -> clustering
+        self.clusters: dict[int, ClusterState] = {}
+
+    # the state is only valid in the process that computed it
+    def __getstate__(self) -> dict:
+        return {}
+
+    def __setstate__(self, state: dict) -> None:
+        self.__init__()
+
+    # switch to a sample set, the state is dropped when it changes
+    def bind(self, samples: NDArray, weights: NDArray | None) -> None:
+        with self._lock:
+            if samples is self.samples and weights is self.weights and _frozen(samples, weights):
+                return
+            key = _fingerprint(samples, weights)
+            if key != self._key:
+                self._key = key
+                self._log_samples = None
+                self._stats = None
+                self.clusters = {}
+            # labels and logs follow the order of the samples, which is the
+            # same for equal fingerprints
+            self.samples = samples
+            self.weights = weights
+
+    @property
+    def log_samples(self) -> NDArray:
+        with self._lock:
+            if self._log_samples is None:
+                self._log_samples = np.log(self.samples)
+            return self._log_samples
+
+    @property
+    def stats(self) -> SampleStats:
+        with self._lock:
+            if self._stats is None:
+                self._stats = SampleStats.from_samples(self.samples, self.weights)
+            return self._stats
+
+    def cluster(self, peaks: int) -> ClusterState | None:
+        with self._lock:
+            return self.clusters.get(peaks)
+
+    def add_cluster(self, peaks: int, state: ClusterState) -> None:
+        with self._lock:
+            self.clusters[peaks] = state
+
+    # initial centers for `peaks` clusters from the closest clustering with
+    # fewer peaks (adding the samples farthest from their centers) or with
+    # more peaks (keeping the heaviest clusters), None without one
+    def seed(self, peaks: int) -> NDArray | None:
+        with self._lock:
+            return self._seed(peaks)
+
+    def _seed(self, peaks: int) -> NDArray | None:
+        fewer = [k for k in self.clusters if k < peaks]
+        more = [k for k in self.clusters if k > peaks]
+        if fewer:
+            state = self.clusters[max(fewer)]
+            samples = self.samples
+            scale = 1.0 if self.weights is None else self.weights
+            dist = (samples - state.centers[state.labels]) ** 2 * scale
+            centers = list(state.centers)
+            for _ in range(peaks - len(centers)):
+                far = samples[np.argmax(dist)]
+                centers.append(far)
+                dist = np.minimum(dist, (samples - far) ** 2 * scale)
+            return np.array(centers)
+        if more:
+            state = self.clusters[min(more)]
+            heaviest = np.argsort(-state.stats.count, kind="stable")[:peaks]
+            return np.sort(state.centers[heaviest])
+        return None
+
+
+class Fitter(ABC):
+    def __init__(self, cache: FitCache | None = None) -> None:
         super().__init__()
+        self.cache = cache
 
-    def fit(self, samples: NDArray) -> AbcPhDist:
+    # weights are optional per-sample counts, e.g. from pre-aggregated data
+    def fit(self, samples: NDArray, weights: NDArray | None = None) -> AbcPhDist:
         if samples.ndim != 1:
             raise ValueError("samples must be 1-dimentional")
-        return self._fit(samples)
+        if weights is not None:
+            weights = np.asarray(weights, dtype=float)
+            if weights.shape != samples.shape:
+                raise ValueError("weights must have the same shape as samples")
+            if np.any(weights < 0) or not np.sum(weights) > 0:
+                raise ValueError("weights must be non-negative with a positive sum")
+        if self.cache is not None:
+            self.cache.bind(samples, weights)
+        return self._fit(samples, weights)
+
+    # fit histogram data, each bucket is represented by its midpoint
+    def fit_hist(self, edges: NDArray, counts: NDArray) -> AbcPhDist:
+        edges = np.asarray(edges, dtype=float)
+        counts = np.asarray(counts, dtype=float)
+        if edges.ndim != 1 or edges.size != counts.size + 1:
+            raise ValueError("histogram needs one more edge than counts")
+        if not np.all(np.isfinite(edges)) or np.any(np.diff(edges) <= 0):
+            raise ValueError("edges must be finite and increasing")
+        mids = (edges[:-1] + edges[1:]) / 2
+        used = counts > 0
+        return self.fit(mids[used], counts[used])
 
     @abstractmethod
-    def _fit(self, samples: NDArray) -> AbcPhDist:
+    def _fit(self, samples: NDArray, weights: NDArray | None) -> AbcPhDist:
         pass
 
+    def _stats(self, samples: NDArray, weights: NDArray | None) -> SampleStats:
+        if self.cache is not None:
+            return self.cache.stats
+        return SampleStats.from_samples(samples, weights)
+
 
 class ExponentialFitter(Fitter):
-    def __init__(self) -> None:
-        super().__init__()
+    def __init__(self, cache: FitCache | None = None) -> None:
+        super().__init__(cache)
 
     # fit an exponential distribution
-    def _fit(self, samples: NDArray) -> AbcPhDist:
-        rate = float(np.mean(samples))
-        return Exponential(1 / rate)
+    def _fit(self, samples: NDArray, weights: NDArray | None) -> AbcPhDist:
+        return self.fit_stats(self._stats(samples, weights))
+
+    def fit_stats(self, stats: SampleStats) -> AbcPhDist:
+        return Exponential(float(self.fit_params(stats)))
+
+    def fit_params(self, stats: SampleStats) -> NDArray:
+        return 1 / np.asarray(stats.mean)
 
 
 class ErlangFitter(Fitter):
@@ -39,69 +272,77 @@ class ErlangFitter(Fitter):
         method: ERMD = ERMD.MLE,
         rounding: ROUNDING = ROUNDING.round,
         max_phase=config.default_param.erlang_max_phase,
+        cache: FitCache | None = None,
     ) -> None:
-        super().__init__()
+        super().__init__(cache)
         self.method = method
         self.rounding = rounding
         self.max_phase = max_phase
 
-    def _fit(self, samples: NDArray) -> AbcPhDist:
-        if self.method == ERMD.MLE:
-            return self._mle_fit(samples)
+    def _fit(self, samples: NDArray, weights: NDArray | None) -> AbcPhDist:
+        return self.fit_stats(self._stats(samples, weights))
+
+    def fit_stats(self, stats: SampleStats) -> AbcPhDist:
+        rate, phase = self.fit_params(stats)
+        return Erlang(float(rate), int(phase))
+
+    # rate and phase from sufficient statistics, the fields of stats may be
+    # arrays to fit many sample sets at once. exact rounding maximizes the
+    # likelihood over integer phases, so it only applies to MLE, a MOM phase
+    # is rounded to the nearest integer
+    def fit_params(self, stats: SampleStats) -> tuple[NDArray, NDArray]:
+        if self.method == ERMD.MLE and self.rounding == ROUNDING.exact:
+            phase = self._exact_phase(stats)
+        elif self.method == ERMD.MLE:
+            phase = self._round_phase(self._mle_calc_phase(stats))
         elif self.method == ERMD.MOM:
-            return self._mom_fit(samples)
+            phase = self._round_phase(self._mom_calc_phase(stats))
         else:
             raise ValueError("fitter must be 'mle' or 'mom'")
+        rate = phase / stats.mean
+        return rate, phase
 
-    # fit an erlang distribution by moments method
-    def _mom_fit(self, samples: NDArray) -> AbcPhDist:
-        sample_mean = np.mean(samples)
+    def _round_phase(self, phase: NDArray) -> NDArray:
         if self.rounding == ROUNDING.ceil:
-            phase = np.ceil(self._mom_calc_phase(samples))
+            phase = np.ceil(phase)
         elif self.rounding == ROUNDING.floor:
-            phase = np.floor(self._mom_calc_phase(samples))
+            phase = np.floor(phase)
         else:
-            phase = np.round(self._mom_calc_phase(samples))
-        rate = float(phase / sample_mean)
-        return Erlang(rate, int(phase))
+            phase = np.round(phase)
+        return np.maximum(phase, 1.0)
 
-    # fit an erlang distribution by maximum likelihood estimation
-    def _mle_fit(self, samples: NDArray) -> AbcPhDist:
-        sample_mean = np.mean(samples)
-        if self.rounding == ROUNDING.ceil:
-            phase = np.ceil(self._mle_calc_phase(samples))
-        elif self.rounding == ROUNDING.floor:
-            phase = np.floor(self._mle_calc_phase(samples))
-        else:
-            phase = np.round(self._mle_calc_phase(samples))
-        rate = float(phase / sample_mean)
-        return Erlang(rate, int(phase))
+    # integer phase maximizing the profile log-likelihood, every k up to
+    # max_phase is evaluated at once
+    def _exact_phase(self, stats: SampleStats) -> NDArray:
+        max_phase = int(self.max_phase)
+        log_mean = np.atleast_1d(np.log(stats.mean))
+        mean_log = np.atleast_1d(stats.mean_log)
+        res = np.empty(log_mean.shape)
+        step = max(1, EXACT_CHUNK_CELLS // max_phase)
+        for lo in range(0, res.size, step):
+            hi = lo + step
+            llh = profile_llh(log_mean[lo:hi], mean_log[lo:hi], max_phase)
+            res[lo:hi] = np.argmax(llh, axis=1) + 1
+        return res.reshape(np.shape(stats.mean))
 
     # calculate phase by moments method
-    def _mom_calc_phase(self, samples: NDArray) -> float:
-        sample_mean = np.mean(samples)
-        sample_var = np.var(samples)
-        if sample_var == 0:
-            sample_var = np.finfo(float).eps
-        phase = (sample_mean**2) / sample_var
-        if phase > self.max_phase:
-            phase = self.max_phase
-        return float(phase)
+    def _mom_calc_phase(self, stats: SampleStats) -> NDArray:
+        sample_var = np.asarray(stats.var)
+        sample_var = np.where(sample_var == 0, np.finfo(float).eps, sample_var)
+        phase = (stats.mean**2) / sample_var
+        return np.minimum(phase, self.max_phase)
 
-    # calculate phase by moments method
+    # calculate phase by maximum likelihood estimation
     # see https://en.wikipedia.org/wiki/Gamma_distribution#Maximum_likelihood_estimation
-    def _mle_calc_phase(self, samples: NDArray) -> float:
-        if samples.ndim != 1:
-            raise ValueError("samples must be 1-dimentional")
-        log_mean = np.log(np.mean(samples))
-        mean_log = sum(map(np.log, samples)) / samples.size
-        s = log_mean - mean_log
+    def _mle_calc_phase(self, stats: SampleStats) -> NDArray:
+        s = np.log(stats.mean) - stats.mean_log
+        # s is zero only when all samples are equal, and infinite when a
+        # sample is zero (the phase goes to 0 and is rounded up to 1)
+        s = np.clip(s, np.finfo(float).tiny, 1 / np.finfo(float).eps)
         res = (s - 3) ** 2 + 24 * s
         res = np.sqrt(res) + 3 - s
         res = res / (12 * s)
-        if res > self.max_phase:
-            res = self.max_phase
-        return res
+        return np.minimum(res, self.max_phase)
 
 
 class HyperErlangFitter(Fitter):
@@ -109,10 +350,11 @@ class HyperErlangFitter(Fitter):
         self,
         peaks: int = config.default_param.herlang_peaks,
         method: ERMD = ERMD.MLE,
-        rounding: ROUNDING = ROUNDING.round,
+        rounding: ROUNDING = config.default_param.herlang_rounding,
         max_phase=config.default_param.herlang_max_phase,
+        cache: FitCache | None = None,
     ) -> None:
-        super().__init__()
+        super().__init__(cache)
         self.peaks = peaks
         self.method = method
         self.rounding = rounding
@@ -122,24 +364,51 @@ class HyperErlangFitter(Fitter):
             rounding=self.rounding,
             max_phase=self.max_phase,)
 
-    def _fit(self, samples: NDArray) -> AbcPhDist:
-        n_clusters = self.peaks
-        sam_2d = samples.reshape(-1, 1)
-        kmeans = KMeans(n_clusters=n_clusters)
-        kmeans.fit(sam_2d)
+    def _fit(self, samples: NDArray, weights: NDArray | None) -> AbcPhDist:
+        stats = self._cluster_stats(samples, weights)
+        # every branch is fitted at once from the cluster statistics
+        rates, phases = self.erlang_fitter.fit_params(stats)
+        probs = stats.count / np.sum(stats.count)
         erlang_branches = []
-        for i in range(n_clusters):
-            cluster_i = sam_2d[kmeans.labels_ == i]
-            cluster_i = cluster_i.reshape(-1)
-            erlang_dist = self.erlang_fitter.fit(cluster_i)
-            prob = cluster_i.size / samples.size
-            branch = HyperErlangBranch(erlang_dist, prob=prob)
+        for rate, phase, prob in zip(rates, phases, probs):
+            erlang_dist = Erlang(float(rate), int(phase))
+            branch = HyperErlangBranch(erlang_dist, prob=float(prob))
             erlang_branches.append(branch)
         return HyperErlang(erlang_branches)
 
+    # cluster the samples and return the statistics of the non-empty
+    # clusters, one entry of the arrays per cluster. with a cache, a known
+    # number of peaks is not clustered again and a new one is seeded from
+    # the closest known clustering
+    def _cluster_stats(self, samples: NDArray, weights: NDArray | None) -> SampleStats:
+        cache = self.cache
+        state = None if cache is None else cache.cluster(self.peaks)
+        if state is None:
+            state = self._cluster(samples, weights)
+            if cache is not None:
+                cache.add_cluster(self.peaks, state)
+        stats = state.stats
+        used = stats.count > 0
+        return SampleStats(
+            stats.count[used], stats.total[used], stats.total_sq[used], stats.total_log[used]
+        )
+
+    def _cluster(self, samples: NDArray, weights: NDArray | None) -> ClusterState:
+        n_clusters = self.peaks
+        sam_2d = samples.reshape(-1, 1)
+        seed = None if self.cache is None else self.cache.seed(n_clusters)
+        if seed is None:
+            kmeans = KMeans(n_clusters=n_clusters)
+        else:
+            kmeans = KMeans(n_clusters=n_clusters, init=seed.reshape(-1, 1), n_init=1)
+        kmeans.fit(sam_2d, sample_weight=weights)
+        log_samples = None if self.cache is None else self.cache.log_samples
+        stats = SampleStats.grouped(samples, kmeans.labels_, n_clusters, weights, log_samples)
+        return ClusterState(kmeans.cluster_centers_.ravel(), kmeans.labels_, stats)
+
 class MAPFitter(Fitter):
     def __init__(self) -> None:
         super().__init__()
 
-    def _fit(self, samples: NDArray) -> AbcPhDist:
+    def _fit(self, samples: NDArray, weights: NDArray | None) -> AbcPhDist:
         pass
@@ -0,0 +1,129 @@
+# goodness-of-fit measures for fitted distributions
+#
+# the samples are sorted once and shared by every candidate, each candidate
+# evaluates its pdf/cdf on the sorted samples with a single vectorized call.
+
+import math
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import astuple, dataclass, fields
+
+import numpy as np
+from numpy.typing import NDArray
+
+from .dist import AbcPhDist, Erlang, Exponential, HyperErlang, PhaseType
+from .dist_batch import DistBatch
+from .fitters import Fitter
+
+DEFAULT_BINS = 50
+_TINY = np.finfo(float).tiny
+_EPS = np.finfo(float).eps
+
+
+@dataclass
+class GofResult:
+    name: str
+    ks: float
+    ad: float
+    llh: float
+    aic: float
+    mean_err: float
+    var_err: float
+    hist_dist: float
+
+
+REPORT_HEADERS = [f.name for f in fields(GofResult)]
+
+
+# sorted samples and the statistics every candidate is compared against
+@dataclass
+class _Reference:
+    x: NDArray
+    mean: float
+    var: float
+    edges: NDArray
+    hist_prob: NDArray
+
+
+def _reference(samples: NDArray, bins: int) -> _Reference:
+    x = np.sort(np.asarray(samples, dtype=float))
+    counts, edges = np.histogram(x, bins=bins)
+    return _Reference(x, float(np.mean(x)), float(np.var(x)), edges, counts / x.size)
+
+
+# number of free parameters, used by the information criterion
+def _param_count(dist: AbcPhDist) -> int:
+    if isinstance(dist, Exponential):
+        return 1
+    if isinstance(dist, Erlang):
+        return 2
+    if isinstance(dist, HyperErlang):
+        return 3 * len(dist.branches) - 1
+    if isinstance(dist, PhaseType):
+        trans = dist.get_trans_matrix()
+        return dist.phase - 1 + int(np.count_nonzero(trans) if isinstance(trans, np.ndarray) else trans.nnz)
+    d0, d1 = dist.get_trans_matrix()  # type: ignore[attr-defined]
+    return d0.size + d1.size
+
+
+def _evaluate_one(name: str, dist: AbcPhDist, ref: _Reference) -> GofResult:
+    x = ref.x
+    n = x.size
+    batch = DistBatch.from_dists([dist])
+    cdf = batch.cdf(x)[0]
+    pdf = batch.pdf(x)[0]
+
+    # Kolmogorov-Smirnov distance to the empirical cdf
+    upper = np.arange(1, n + 1) / n - cdf
+    lower = cdf - np.arange(n) / n
+    ks = float(max(upper.max(), lower.max()))
+
+    # Anderson-Darling statistic
+    cdf_c = np.clip(cdf, _EPS, 1 - _EPS)
+    i = np.arange(1, n + 1)
+    ad = -n - float(np.sum((2 * i - 1) * (np.log(cdf_c) + np.log1p(-cdf_c[::-1])))) / n
+
+    llh = float(np.sum(np.log(np.maximum(pdf, _TINY))))
+    aic = 2 * _param_count(dist) - 2 * llh
+
+    # total variation distance between the binned samples and the model
+    model_prob = np.diff(batch.cdf(ref.edges)[0])
+    hist_dist = 0.5 * float(np.sum(np.abs(ref.hist_prob - model_prob)))
+
+    mean_err = abs(dist.mean - ref.mean) / ref.mean if ref.mean else math.inf
+    var_err = abs(dist.var - ref.var) / ref.var if ref.var else math.inf
+    return GofResult(name, ks, ad, llh, aic, mean_err, var_err, hist_dist)
+
+
+# evaluate several fitted distributions against the same samples,
+# results are sorted by AIC, best first
+def evaluate(
+    samples: NDArray,
+    dists: dict[str, AbcPhDist],
+    bins: int = DEFAULT_BINS,
+    workers: int | None = None,
+) -> list[GofResult]:
+    if np.squeeze(samples).ndim != 1:
+        raise ValueError("samples must be 1-dimentional")
+    ref = _reference(np.squeeze(samples), bins)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(_evaluate_one, name, dist, ref) for name, dist in dists.items()]
+        results = [f.result() for f in futures]
+    return sorted(results, key=lambda r: r.aic)
+
+
+# fit every candidate in parallel and evaluate the fitted distributions
+def compare_fitters(
+    samples: NDArray,
+    fitters: dict[str, Fitter],
+    bins: int = DEFAULT_BINS,
+    workers: int | None = None,
+) -> tuple[dict[str, AbcPhDist], list[GofResult]]:
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {name: pool.submit(fitter.fit, samples) for name, fitter in fitters.items()}
+        dists = {name: f.result() for name, f in futures.items()}
+    return dists, evaluate(samples, dists, bins=bins, workers=workers)
+
+
+# rows for a table, in the order of REPORT_HEADERS
+def to_rows(results: list[GofResult]) -> list[list]:
+    return [list(astuple(r)) for r in results]
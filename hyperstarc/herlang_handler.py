@@ -24,6 +24,12 @@ def her_round_change(rounding: str, params: Parameters) -> Parameters:
     logger.debug(f"herlang_rounding: {params.herlang_rounding}")
     return params
 
+# event handler for the total phase budget, 0 disables it
+def her_budget_change(budget: int, params: Parameters) -> Parameters:
+    params.herlang_phase_budget = max(int(budget), 0)
+    logger.debug(f"herlang_phase_budget: {params.herlang_phase_budget}")
+    return params
+
 def her_max_phase_change(phase: int, params: Parameters)->Parameters:
     max_phase = phase
     if max_phase < 1:
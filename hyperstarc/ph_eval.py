@@ -0,0 +1,93 @@
+# grid evaluation of phase-type densities by uniformization
+#
+# for a phase-type distribution (alpha, T) the transient vector
+# v(x) = alpha e^{Tx} gives f(x) = v(x) t with t = -T 1 and F(x) = 1 - v(x) 1.
+# with q >= max|T_ii| and P = I + T / q,
+# v(x) = \sum_k e^{-qx} \frac{(qx)^k}{k!} alpha P^k.
+# the grid is walked in sorted order and v is carried from one point to the
+# next, so the whole grid costs about q * max(x) sparse matrix-vector products
+# instead of one dense matrix exponential per point.
+
+import numpy as np
+from numpy.typing import ArrayLike, NDArray
+from scipy import sparse
+
+# generators at least this large with few non-zeros are handled as sparse
+SPARSE_MIN_DIM = 64
+SPARSE_MAX_DENSITY = 0.1
+# largest q * step of a single uniformization pass, keeps e^{-q step} finite
+MAX_UNIF_STEP = 50.0
+TOLERANCE = 1e-12
+
+
+def _prepare(trans: NDArray | sparse.spmatrix) -> tuple:
+    dim = trans.shape[0]
+    if sparse.issparse(trans):
+        mat = sparse.csr_matrix(trans, dtype=float)
+    else:
+        trans = np.asarray(trans, dtype=float)
+        density = np.count_nonzero(trans) / trans.size
+        if dim >= SPARSE_MIN_DIM and density <= SPARSE_MAX_DENSITY:
+            mat = sparse.csr_matrix(trans)
+        else:
+            mat = trans
+    exit_rates = -np.asarray(mat @ np.ones(dim)).ravel()
+    q = float(np.max(-mat.diagonal()))
+    if q <= 0:
+        raise ValueError("trans must have a negative diagonal")
+    # transpose so that v P is computed as P^T v
+    if sparse.issparse(mat):
+        p_t = (sparse.identity(dim, format="csr") + mat / q).T.tocsr()
+    else:
+        p_t = (np.eye(dim) + mat / q).T.copy()
+    return p_t, q, exit_rates
+
+
+def _uniformize(v: NDArray, p_t, lam: float) -> NDArray:
+    weight = np.exp(-lam)
+    term = v
+    res = weight * term
+    total = weight
+    k = 0
+    while 1 - total > TOLERANCE and k < 10 * lam + 100:
+        k += 1
+        term = p_t @ term
+        weight *= lam / k
+        res = res + weight * term
+        total += weight
+    return res
+
+
+def _advance(v: NDArray, p_t, lam: float) -> NDArray:
+    while lam > 0:
+        step = min(lam, MAX_UNIF_STEP)
+        v = _uniformize(v, p_t, step)
+        lam -= step
+    return v
+
+
+# pdf and cdf of the phase-type distribution (alpha, trans) at every x,
+# x may be given in any order and shape
+def grid_eval(
+    alpha: NDArray, trans: NDArray | sparse.spmatrix, x: ArrayLike
+) -> tuple[NDArray, NDArray]:
+    alpha = np.asarray(alpha, dtype=float).ravel()
+    if trans.shape != (alpha.size, alpha.size):
+        raise ValueError("alpha and trans do not match")
+    x = np.asarray(x, dtype=float)
+    flat = x.ravel()
+    order = np.argsort(flat, kind="stable")
+    p_t, q, exit_rates = _prepare(trans)
+    pdf = np.zeros(flat.size)
+    cdf = np.zeros(flat.size)
+    v = alpha
+    pos = 0.0
+    for idx in order:
+        xi = flat[idx]
+        if xi < 0:
+            continue
+        v = _advance(v, p_t, q * (xi - pos))
+        pos = xi
+        pdf[idx] = v @ exit_rates
+        cdf[idx] = 1 - v.sum()
+    return pdf.reshape(x.shape), cdf.reshape(x.shape)
@@ -0,0 +1,140 @@
+# hyper-Erlang fitting under a total phase budget
+#
+# like HyperStar, allocations of the phase budget over the branches are
+# enumerated. the samples are clustered once, then
+# 1. every branch gets a profile log-likelihood table over its phase count,
+#    computed from the cluster statistics only,
+# 2. branch and bound over the branches finds the allocations with the best
+#    sum of branch likelihoods, a partial allocation is pruned when even the
+#    best allocation of the phases left to the remaining branches cannot
+#    reach the current top list,
+# 3. the surviving candidates are ranked in parallel by the log-likelihood
+#    of the full mixture over all samples.
+
+import heapq
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from numpy.typing import NDArray
+from scipy.special import gammaln, logsumexp, xlogy
+
+from . import config
+from .config import ERMD, ROUNDING
+from .dist import AbcPhDist, Erlang, HyperErlang, HyperErlangBranch
+from .fitters import FitCache, HyperErlangFitter, profile_llh
+
+DEFAULT_CANDIDATES = 32
+
+
+# best gain of branches i.. with at most r phases, at least one per branch,
+# -inf when r is too small. a knapsack over the branches, back to front
+def _best_rest(table: NDArray, budget: int) -> NDArray:
+    n_branches, max_phase = table.shape
+    res = np.full((n_branches + 1, budget + 1), -np.inf)
+    res[n_branches] = 0.0
+    for i in range(n_branches - 1, -1, -1):
+        row = res[i]
+        for k in range(1, min(max_phase, budget) + 1):
+            np.maximum(row[k:], table[i, k - 1] + res[i + 1, : budget + 1 - k], out=row[k:])
+    return res
+
+
+# the best `size` allocations of at most `budget` phases, one row of table
+# per branch with the gain of phases 1..K, best first
+def top_allocations(table: NDArray, budget: int, size: int) -> list[tuple[float, tuple[int, ...]]]:
+    n_branches, max_phase = table.shape
+    if budget < n_branches:
+        raise ValueError("budget must allow at least one phase per branch")
+    rest = _best_rest(table, budget)
+    orders = np.argsort(-table, axis=1) + 1
+    heap: list[tuple[float, tuple[int, ...]]] = []
+    alloc: list[int] = []
+
+    def visit(i: int, used: int, score: float) -> None:
+        if i == n_branches:
+            item = (score, tuple(alloc))
+            if len(heap) < size:
+                heapq.heappush(heap, item)
+            elif item > heap[0]:
+                heapq.heapreplace(heap, item)
+            return
+        # keep one phase for each of the remaining branches
+        left = budget - used - (n_branches - i - 1)
+        for k in orders[i]:
+            if k > left:
+                continue
+            gain = score + table[i, k - 1]
+            if len(heap) == size:
+                # phases are visited by decreasing gain and the remaining
+                # branches get at most budget - used - 1 phases, nothing
+                # later can do better
+                if gain + rest[i + 1, budget - used - 1] <= heap[0][0]:
+                    break
+                if gain + rest[i + 1, budget - used - k] <= heap[0][0]:
+                    continue
+            alloc.append(int(k))
+            visit(i + 1, used + k, gain)
+            alloc.pop()
+
+    visit(0, 0, 0.0)
+    return sorted(heap, reverse=True)
+
+
+def _mixture_llh(
+    samples: NDArray,
+    weights: NDArray | None,
+    log_prob: NDArray,
+    means: NDArray,
+    phases: tuple[int, ...],
+) -> float:
+    k = np.array(phases, dtype=float)[:, None]
+    rate = k / means[:, None]
+    x = samples[None, :]
+    log_f = k * np.log(rate) + xlogy(k - 1, x) - rate * x - gammaln(k)
+    llh = logsumexp(log_f + log_prob[:, None], axis=0)
+    return float(np.sum(llh) if weights is None else np.dot(weights, llh))
+
+
+class PhaseBudgetFitter(HyperErlangFitter):
+    def __init__(
+        self,
+        budget: int,
+        peaks: int = config.default_param.herlang_peaks,
+        max_phase=config.default_param.herlang_max_phase,
+        candidates: int = DEFAULT_CANDIDATES,
+        workers: int | None = None,
+        cache: FitCache | None = None,
+    ) -> None:
+        super().__init__(
+            peaks=peaks, method=ERMD.MLE, rounding=ROUNDING.exact, max_phase=max_phase, cache=cache
+        )
+        if budget < peaks:
+            raise ValueError("budget must allow at least one phase per peak")
+        self.budget = budget
+        self.candidates = candidates
+        self.workers = workers
+        # (log-likelihood, phases) of the ranked candidates of the last fit
+        self.ranking: list[tuple[float, tuple[int, ...]]] = []
+
+    def _fit(self, samples: NDArray, weights: NDArray | None) -> AbcPhDist:
+        stats = self._cluster_stats(samples, weights)
+        counts, means, mean_logs = stats.count, stats.mean, stats.mean_log
+        max_phase = min(int(self.max_phase), self.budget - counts.size + 1)
+        table = profile_llh(np.log(means), mean_logs, max_phase) * counts[:, None]
+        allocations = top_allocations(table, self.budget, self.candidates)
+
+        log_prob = np.log(counts / counts.sum())
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            scores = list(
+                pool.map(
+                    lambda item: _mixture_llh(samples, weights, log_prob, means, item[1]),
+                    allocations,
+                )
+            )
+        self.ranking = sorted(zip(scores, (a for _, a in allocations)), reverse=True)
+        best = self.ranking[0][1]
+        branches = [
+            HyperErlangBranch(Erlang(float(k / mean), int(k)), prob=float(p))
+            for k, mean, p in zip(best, means, counts / counts.sum())
+        ]
+        return HyperErlang(branches)
@@ -7,6 +7,7 @@ from numpy.typing import NDArray
 
 from . import config
 from .config import Parameters
+from .window_fit import WindowFits
 
 logger = logging.getLogger(__name__)
 
@@ -54,6 +55,19 @@ def gen_sa_cdf(samples: NDArray|None, params: Parameters) -> Figure:
     plt.tight_layout()
     return fig
 
+# draw fitted parameters of every window
+def gen_window_plot(fits: WindowFits) -> Figure:
+    fig, ax = plt.subplots()
+    ax.plot(fits.starts, fits.rate, color="red")
+    ax.set_xlabel("window start")
+    ax.set_ylabel("rate", color="red")
+    if np.any(fits.phase != 1):
+        ax2 = ax.twinx()
+        ax2.step(fits.starts, fits.phase, color="blue", where="post")
+        ax2.set_ylabel("phase", color="blue")
+    plt.tight_layout()
+    return fig
+
 # replot histogram, number of samples may change
 def replot_click(params: Parameters)->tuple[Figure, Figure]:
     samples = params.samples_plot
@@ -0,0 +1,340 @@
+# matrix-analytic solver for MAP/PH/1 and PH/PH/1 queues
+#
+# the queue is a quasi-birth-death process, level n is the number of
+# customers and the phase is (arrival phase i, service phase j), i * s + j.
+# with arrivals (D0, D1) of order m and service (beta, S) of order s:
+#   up    A0 = D1 ⊗ I_s
+#   local A1 = D0 ⊕ S = D0 ⊗ I_s + I_m ⊗ S
+#   down  A2 = I_m ⊗ s0 beta, s0 = -S 1
+# none of the m s x m s blocks is formed. the level-down matrix is
+# G = K (I_m ⊗ beta) with K = (-(C ⊕ S))^{-1} (I_m ⊗ s0), where
+# C = D0 + D1 (I_m ⊗ beta) K is the arrival phase generator over a service
+# including the busy periods it triggers. with U = A1 + A0 G the levels are
+# pi_{n+1} = pi_n A0 (-U)^{-1}, and -U is the Kronecker sum -A1 minus a rank
+# m term, so each level is one Sylvester solve with the Schur forms of D0 and
+# S, O(m s (m + s)), plus a Woodbury correction.
+#   renewal arrivals, D1 = t alpha: C and the waiting time come from the
+#   Riccati equation of the ladder heights, solved by doubling in
+#   O(m^3 + s^3) per step, Poisson arrivals need no iteration. the waiting
+#   time is PH(eta, S + s0 eta) of order s.
+#   MAP arrivals: C by functional iteration, O(m^2 s (m + s)) per step, and
+#   the waiting time has a dense representation of order m s, so MAPs should
+#   have few phases.
+# at utilization 0.9 PH(100)/PH(100)/1 takes about 0.4s, PH(200)/PH(200)/1
+# about 3s and M/PH(1000)/1 or MAP(2)/PH(500)/1 about 1s.
+
+import math
+from dataclasses import dataclass
+
+import numpy as np
+from numpy.typing import NDArray
+from scipy import linalg, sparse
+
+from . import ph_eval
+from .dist import MAP, AbcPhDist, Erlang, Exponential, HyperErlang, PhaseType
+
+TOLERANCE = 1e-12
+MAX_ITERATIONS = 10_000
+MAX_DOUBLINGS = 100
+# levels kept for the queue length distribution
+MAX_LEVELS = 100_000
+WAITING_MOMENTS = 3
+QUANTILE_GRID = 256
+
+
+@dataclass
+class QueueResult:
+    arrival_rate: float
+    utilization: float
+    mean_service: float
+    # P(N = n) for n = 0, 1, ..., truncated when the tail is below TOLERANCE
+    queue_length: NDArray
+    mean_queue_length: float
+    # E[W^k] for k = 1, 2, ...
+    waiting_moments: NDArray
+    # waiting time of an arriving customer, the missing mass of alpha is
+    # the probability of not waiting
+    waiting_time: PhaseType
+
+    @property
+    def mean_waiting(self) -> float:
+        return float(self.waiting_moments[0])
+
+    @property
+    def mean_response(self) -> float:
+        return self.mean_waiting + self.mean_service
+
+    # smallest n with P(N <= n) >= q
+    def queue_length_quantile(self, q: float) -> int:
+        if not 0 <= q < 1:
+            raise ValueError("q must be in [0, 1)")
+        cdf = np.cumsum(self.queue_length)
+        return int(min(np.searchsorted(cdf, q), cdf.size - 1))
+
+    # waiting time quantile, found on a coarse and then a fine cdf grid
+    def waiting_quantile(self, q: float) -> float:
+        if not 0 <= q < 1:
+            raise ValueError("q must be in [0, 1)")
+        dist = self.waiting_time
+        if q <= 1 - dist.get_alpha().sum():
+            return 0.0
+        alpha, trans = dist.get_alpha(), dist.get_trans_matrix()
+        hi = dist.mean + 10 * math.sqrt(max(dist.var, 0.0)) + TOLERANCE
+        while ph_eval.grid_eval(alpha, trans, [hi])[1][0] < q:
+            hi *= 2
+        lo = 0.0
+        for _ in range(2):
+            grid = np.linspace(lo, hi, QUANTILE_GRID)
+            cdf = ph_eval.grid_eval(alpha, trans, grid)[1]
+            idx = int(np.searchsorted(cdf, q))
+            lo, hi = grid[max(idx - 1, 0)], grid[min(idx, grid.size - 1)]
+        return float(hi)
+
+
+# initial vector and sub-generator of a phase-type distribution
+def ph_representation(dist: AbcPhDist) -> tuple[NDArray, NDArray]:
+    if isinstance(dist, Exponential):
+        return np.ones(1), np.array([[-dist.rate]])
+    if isinstance(dist, Erlang):
+        alpha = np.zeros(dist.phase)
+        alpha[0] = 1
+        return alpha, dist.get_trans_matrix()
+    if isinstance(dist, (HyperErlang, PhaseType)):
+        trans = dist.get_trans_matrix()
+        trans = trans.toarray() if sparse.issparse(trans) else np.asarray(trans)
+        return dist.get_alpha(), trans
+    raise ValueError(f"{type(dist).__name__} is not a phase-type distribution")
+
+
+# (D0, D1) of an arrival process, a phase-type distribution gives a renewal
+# process with D1 = t alpha
+def map_representation(dist: AbcPhDist) -> tuple[NDArray, NDArray]:
+    if isinstance(dist, MAP):
+        return dist.get_trans_matrix()
+    alpha, trans = ph_representation(dist)
+    exit_rates = -trans @ np.ones(alpha.size)
+    return trans, np.outer(exit_rates, alpha)
+
+
+def _stationary(gen: NDArray) -> NDArray:
+    dim = gen.shape[0]
+    lhs = np.vstack([gen.T, np.ones((1, dim))])
+    rhs = np.zeros(dim + 1)
+    rhs[-1] = 1
+    return np.linalg.lstsq(lhs, rhs, rcond=None)[0]
+
+
+def _schur(a: NDArray) -> tuple[NDArray, NDArray]:
+    return linalg.schur(a, output="real")
+
+
+# solves with the Kronecker sum A ⊕ B of an m x m and an s x s matrix given
+# by their real Schur forms. a vector of length m s is the m x s matrix X in
+# row-major order, (A ⊕ B) x is A X + X B^T and x (A ⊕ B) is A^T X + X B.
+class _KronSum:
+    def __init__(self, a_schur: tuple[NDArray, NDArray], b_schur: tuple[NDArray, NDArray]):
+        (self._ta, self._ua), (self._tb, self._ub) = a_schur, b_schur
+        self._trsyl = linalg.get_lapack_funcs("trsyl", (self._ta, self._tb))
+
+    def _solve(self, c: NDArray, trana: str, tranb: str) -> NDArray:
+        c = c.reshape(self._ua.shape[0], self._ub.shape[0])
+        x, scale, _ = self._trsyl(self._ta, self._tb, self._ua.T @ c @ self._ub, trana=trana, tranb=tranb)
+        return (self._ua @ x @ self._ub.T).ravel() / scale
+
+    # x with (A ⊕ B) x = c
+    def solve(self, c: NDArray) -> NDArray:
+        return self._solve(c, "N", "T")
+
+    # x with x (A ⊕ B) = c
+    def solve_left(self, c: NDArray) -> NDArray:
+        return self._solve(c, "T", "N")
+
+
+# K = (-(C ⊕ S))^{-1} (I_m ⊗ s0), column k is the first passage to the level
+# below ending in arrival phase k
+def _passage(c: NDArray, service_schur: tuple[NDArray, NDArray], exit_rates: NDArray) -> NDArray:
+    kron = _KronSum(_schur(c), service_schur)
+    return np.column_stack([-kron.solve(np.outer(e, exit_rates)) for e in np.eye(c.shape[0])])
+
+
+# minimal non-negative solutions of X C X - X D - A X + B = 0 and of its dual
+# Y B Y - Y A - D Y + C = 0 when [[D, -C], [-B, A]] is an M-matrix, by the
+# structure-preserving doubling algorithm of Guo, Lin and Xu
+def _doubling(a: NDArray, b: NDArray, c: NDArray, d: NDArray) -> tuple[NDArray, NDArray]:
+    m, s = b.shape
+    eye_m, eye_s = np.eye(m), np.eye(s)
+    gamma = max(np.max(np.diag(a)), np.max(np.diag(d)))
+    a_inv = np.linalg.inv(a + gamma * eye_m)
+    d_inv = np.linalg.inv(d + gamma * eye_s)
+    w_inv = np.linalg.inv(a + gamma * eye_m - b @ d_inv @ c)
+    v_inv = np.linalg.inv(d + gamma * eye_s - c @ a_inv @ b)
+    e = eye_s - 2 * gamma * v_inv
+    f = eye_m - 2 * gamma * w_inv
+    g = 2 * gamma * d_inv @ c @ w_inv
+    h = 2 * gamma * w_inv @ b @ d_inv
+    for _ in range(MAX_DOUBLINGS):
+        # (I - G H)^{-1} and (I - H G)^{-1} through the smaller of the two
+        if m <= s:
+            hg_inv = np.linalg.inv(eye_m - h @ g)
+            e_gh = e + (e @ g) @ hg_inv @ h
+            f_hg = f @ hg_inv
+        else:
+            gh_inv = np.linalg.inv(eye_s - g @ h)
+            e_gh = e @ gh_inv
+            f_hg = f + (f @ h) @ gh_inv @ g
+        g_next = g + e_gh @ g @ f
+        h_next = h + f_hg @ h @ e
+        e, f = e_gh @ e, f_hg @ f
+        step = max(np.max(np.abs(g_next - g)), np.max(np.abs(h_next - h)))
+        g, h = g_next, h_next
+        if step < TOLERANCE:
+            return h, g
+    raise RuntimeError("doubling did not converge")
+
+
+# C = D0 + D1 (I_m ⊗ beta) K(C) by functional iteration from a stochastic
+# busy period matrix
+def _busy_generator(d0: NDArray, d1: NDArray, beta: NDArray, service: NDArray) -> NDArray:
+    m, s = d0.shape[0], beta.size
+    exit_rates = -service @ np.ones(s)
+    service_schur = _schur(service)
+    busy = np.outer(np.ones(m), _stationary(d0 + d1))
+    for _ in range(MAX_ITERATIONS):
+        k = _passage(d0 + d1 @ busy, service_schur, exit_rates)
+        update = np.einsum("ijk,j->ik", k.reshape(m, s, m), beta)
+        step = np.max(np.abs(update - busy))
+        busy = update
+        if step < TOLERANCE:
+            return d0 + d1 @ busy
+    raise RuntimeError("busy period iteration did not converge")
+
+
+# level 0 by arrival phase, P(N = n) and E[N] given the arrival phase
+# generator c over a service and p = (D1 ⊗ I_s) K
+def _levels(
+    d0: NDArray,
+    d1: NDArray,
+    beta: NDArray,
+    service: NDArray,
+    c: NDArray,
+    p: NDArray,
+    utilization: float,
+) -> tuple[NDArray, NDArray, float]:
+    m, s = d0.shape[0], beta.size
+    local = _KronSum(_schur(d0), _schur(service))
+    # -U = -A1 - P Q with Q = I_m ⊗ beta, rows are solved with -A1 and
+    # corrected by the Woodbury identity
+    q_inv = np.array([-local.solve_left(np.outer(e, beta)) for e in np.eye(m)])
+    core = np.linalg.inv(np.eye(m) - q_inv @ p) @ q_inv
+
+    def step(x: NDArray) -> NDArray:
+        y = -local.solve_left(x)
+        return y + (y @ p) @ core
+
+    # pi0 C = 0 and P(N = 0) = 1 - utilization
+    pi0 = _stationary(c) * (1 - utilization)
+    level = step(np.outer(pi0 @ d1, beta))
+    probs = [pi0.sum(), level.sum()]
+    mass = 1 - probs[0] - probs[1]
+    while mass > TOLERANCE and len(probs) <= MAX_LEVELS:
+        level = step(d1.T @ level.reshape(m, s))
+        probs.append(level.sum())
+        mass -= probs[-1]
+    queue_length = np.array(probs)
+    mean_queue_length = float(np.arange(queue_length.size) @ queue_length)
+    return pi0, queue_length, mean_queue_length
+
+
+def _utilization(arrival_rate: float, mean_service: float) -> float:
+    utilization = arrival_rate * mean_service
+    if utilization >= 1:
+        raise ValueError(f"queue is unstable, utilization {utilization:.4f} >= 1")
+    return utilization
+
+
+def _result(
+    arrival_rate: float,
+    mean_service: float,
+    utilization: float,
+    levels: tuple[NDArray, NDArray, float],
+    waiting: PhaseType,
+) -> QueueResult:
+    _, queue_length, mean_queue_length = levels
+    moments = np.array([waiting.get_moment(n) for n in range(1, WAITING_MOMENTS + 1)])
+    return QueueResult(
+        arrival_rate=arrival_rate,
+        utilization=utilization,
+        mean_service=mean_service,
+        queue_length=queue_length,
+        mean_queue_length=mean_queue_length,
+        waiting_moments=moments,
+        waiting_time=waiting,
+    )
+
+
+def solve_map_ph1(d0: NDArray, d1: NDArray, beta: NDArray, service: NDArray) -> QueueResult:
+    # D1 of rank one is t alpha, a renewal process
+    if np.linalg.matrix_rank(d1) == 1:
+        return solve_ph_ph1(d1.sum(axis=0) / d1.sum(), d0, beta, service)
+    m, s = d0.shape[0], beta.size
+    ones_m = np.ones(m)
+    theta = _stationary(d0 + d1)
+    arrival_rate = float(theta @ d1 @ ones_m)
+    mean_service = float(beta @ np.linalg.solve(-service, np.ones(s)))
+    utilization = _utilization(arrival_rate, mean_service)
+    c = _busy_generator(d0, d1, beta, service)
+    k = _passage(c, _schur(service), -service @ np.ones(s))
+    p = np.column_stack([(d1 @ col.reshape(m, s)).ravel() for col in k.T])
+    levels = _levels(d0, d1, beta, service, c, p, utilization)
+    pi0 = levels[0]
+
+    # workload seen by an arrival: as a fluid rising at rate 1 over the
+    # services, with up phases (i, j) of generator F = I_m ⊗ S + K (D1 ⊗ beta),
+    # P(W > x) = nu e^{Fx} K D1 1 with nu = pi0 (D1 ⊗ beta) (-F)^{-1} / lambda.
+    # transposing F with diag(nu) makes it a phase-type representation
+    arrivals = np.kron(d1, beta[None, :])
+    fluid = np.kron(np.eye(m), service) + k @ arrivals
+    nu = np.linalg.solve(-fluid.T, pi0 @ arrivals) / arrival_rate
+    keep = nu > TOLERANCE * nu.max()
+    nu, fluid = nu[keep], fluid[np.ix_(keep, keep)]
+    seen = (k @ (d1 @ ones_m))[keep] * nu
+    waiting = PhaseType(seen, fluid.T * nu[None, :] / nu[:, None])
+    return _result(arrival_rate, mean_service, utilization, levels, waiting)
+
+
+def solve_ph_ph1(alpha: NDArray, trans: NDArray, beta: NDArray, service: NDArray) -> QueueResult:
+    m, s = alpha.size, beta.size
+    arrival_exit = -trans @ np.ones(m)
+    exit_rates = -service @ np.ones(s)
+    arrival_rate = 1 / float(alpha @ np.linalg.solve(-trans, np.ones(m)))
+    mean_service = float(beta @ np.linalg.solve(-service, np.ones(s)))
+    utilization = _utilization(arrival_rate, mean_service)
+
+    # ladder heights of the waiting time (Sengupta): T_A Q + Q (S + s0 alpha Q)
+    # = -t beta gives W ~ PH(alpha Q, S + s0 alpha Q). the dual solution
+    # Y = (alpha ⊗ I_s) K of S Y + Y (T_A + t beta Y) = -s0 alpha gives
+    # C = T_A + t beta Y
+    if m == 1:
+        # Poisson arrivals: busy periods end surely, Y = 1, and
+        # alpha Q = lambda beta (-S)^{-1} (Pollaczek-Khinchine)
+        dual = np.ones((s, 1))
+        eta = arrival_rate * np.linalg.solve(-service.T, beta)
+    else:
+        ladder, dual = _doubling(-trans, np.outer(arrival_exit, beta), np.outer(exit_rates, alpha), -service)
+        eta = alpha @ ladder
+    waiting = PhaseType(eta, service + np.outer(exit_rates, eta))
+    c = trans + np.outer(arrival_exit, beta @ dual)
+    p = np.kron(arrival_exit[:, None], dual)
+    levels = _levels(trans, np.outer(arrival_exit, alpha), beta, service, c, p, utilization)
+    return _result(arrival_rate, mean_service, utilization, levels, waiting)
+
+
+# solve a single-server FCFS queue from fitted models, arrival may be a MAP
+# or any phase-type distribution of inter-arrival times
+def solve(arrival: AbcPhDist, service: AbcPhDist) -> QueueResult:
+    beta, trans = ph_representation(service)
+    if isinstance(arrival, MAP):
+        d0, d1 = arrival.get_trans_matrix()
+        return solve_map_ph1(np.asarray(d0, dtype=float), np.asarray(d1, dtype=float), beta, trans)
+    alpha, arrival_trans = ph_representation(arrival)
+    return solve_ph_ph1(alpha, arrival_trans, beta, trans)
@@ -0,0 +1,229 @@
+# parallel reader for large text sample files
+#
+# a plain file is split into byte ranges on line boundaries. worker
+# processes first count the lines of every range, which gives each range
+# its first line number and an upper bound of its rows, so the result is
+# preallocated once and every parsed range is copied into its slot as soon
+# as it arrives. only a few ranges are parsed or waiting to be copied at a
+# time, peak memory stays close to the size of the result. gzip input cannot
+# be split without decompressing it, it is streamed in blocks that are parsed
+# in parallel and appended to a result grown in place.
+
+import gzip
+import io
+import os
+import warnings
+from collections import deque
+from concurrent.futures import (FIRST_COMPLETED, ProcessPoolExecutor,
+                                ThreadPoolExecutor, wait)
+from pathlib import Path
+
+import numpy as np
+from numpy.typing import NDArray
+
+# bytes of text per parsed range
+CHUNK_BYTES = 8 * 2**20
+COMMENT = "#"
+GZIP_MAGIC = b"\x1f\x8b"
+
+
+class ParseError(ValueError):
+    def __init__(self, line: int, text: str) -> None:
+        super().__init__(line, text)
+        self.line = line
+        self.text = text
+
+    def __str__(self) -> str:
+        return f"line {self.line}: cannot parse {self.text!r}"
+
+
+def _is_gzip(path: Path) -> bool:
+    with open(path, "rb") as f:
+        return f.read(2) == GZIP_MAGIC
+
+
+def _split_values(line: str, delimiter: str | None) -> list[str] | None:
+    line = line.split(COMMENT, 1)[0].strip()
+    if not line:
+        return None
+    return line.split(delimiter)
+
+
+# find the first bad line of a block that failed to parse
+def _locate_error(data: bytes, first_line: int, n_columns: int, delimiter: str | None) -> ParseError:
+    for offset, raw in enumerate(data.split(b"\n")):
+        text = raw.decode(errors="replace")
+        values = _split_values(text, delimiter)
+        if values is None:
+            continue
+        try:
+            [float(v) for v in values]
+        except ValueError:
+            return ParseError(first_line + offset, text.strip())
+        if len(values) != n_columns:
+            return ParseError(first_line + offset, text.strip())
+    return ParseError(first_line, "")
+
+
+def _parse(data: bytes, first_line: int, n_columns: int, delimiter: str | None) -> NDArray:
+    try:
+        with warnings.catch_warnings():
+            # blocks holding only comments or blank lines are fine
+            warnings.simplefilter("ignore", UserWarning)
+            res = np.loadtxt(io.BytesIO(data), delimiter=delimiter, comments=COMMENT, ndmin=2)
+    except ValueError:
+        raise _locate_error(data, first_line, n_columns, delimiter)
+    if res.size == 0:
+        return np.empty((0, n_columns))
+    if res.shape[1] != n_columns:
+        raise _locate_error(data, first_line, n_columns, delimiter)
+    return res
+
+
+def _read_range(path: str, start: int, stop: int) -> bytes:
+    with open(path, "rb") as f:
+        f.seek(start)
+        return f.read(stop - start)
+
+
+def _count_task(path: str, start: int, stop: int) -> int:
+    return _read_range(path, start, stop).count(b"\n")
+
+
+def _parse_task(path: str, start: int, stop: int, first_line: int, n_columns: int, delimiter: str | None) -> NDArray:
+    return _parse(_read_range(path, start, stop), first_line, n_columns, delimiter)
+
+
+# byte ranges of about CHUNK_BYTES that end on line boundaries
+def _ranges(path: Path, size: int) -> list[tuple[int, int]]:
+    bounds = [0]
+    with open(path, "rb") as f:
+        for pos in range(CHUNK_BYTES, size, CHUNK_BYTES):
+            if pos <= bounds[-1]:
+                continue
+            f.seek(pos)
+            f.readline()
+            if f.tell() < size:
+                bounds.append(f.tell())
+    bounds.append(size)
+    return list(zip(bounds[:-1], bounds[1:]))
+
+
+def _first_row(path: Path, opener, delimiter: str | None) -> int:
+    with opener(path, "rt") as f:
+        for line_no, line in enumerate(f, start=1):
+            values = _split_values(line, delimiter)
+            if values is None:
+                continue
+            try:
+                [float(v) for v in values]
+            except ValueError:
+                raise ParseError(line_no, line.strip())
+            return len(values)
+    raise ValueError("file contains no samples")
+
+
+# a single worker runs in-process, nothing has to be pickled
+def _pool(workers: int) -> ProcessPoolExecutor | ThreadPoolExecutor:
+    if workers == 1:
+        return ThreadPoolExecutor(max_workers=1)
+    return ProcessPoolExecutor(max_workers=workers)
+
+
+def _read_plain(path: Path, n_columns: int, delimiter: str | None, workers: int) -> NDArray:
+    ranges = _ranges(path, path.stat().st_size)
+    if len(ranges) == 1:
+        return _parse(path.read_bytes(), 1, n_columns, delimiter)
+    with _pool(workers) as pool:
+        counts = list(pool.map(_count_task, *zip(*[(str(path), a, b) for a, b in ranges])))
+        # a last line without newline is a row as well
+        rows = np.array(counts) + 1
+        offsets = np.concatenate([[0], np.cumsum(rows)])
+        first_lines = np.concatenate([[1], np.cumsum(counts)[:-1] + 1])
+        res = np.empty((int(offsets[-1]), n_columns))
+        used = np.zeros(len(ranges), dtype=np.int64)
+        tasks = iter(enumerate(zip(ranges, first_lines)))
+        running: dict = {}
+        # at most one range per worker and one spare are in flight, a parsed
+        # range is dropped as soon as it is copied
+        while True:
+            for i, ((a, b), line) in tasks:
+                running[pool.submit(_parse_task, str(path), a, b, int(line), n_columns, delimiter)] = i
+                if len(running) > workers:
+                    break
+            if not running:
+                break
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                i = running.pop(future)
+                block = future.result()
+                res[offsets[i] : offsets[i] + len(block)] = block
+                used[i] = len(block)
+            del done, future, block
+    # move the blocks together, skipped blank and comment lines leave gaps
+    pos = 0
+    for i, n in enumerate(used):
+        if offsets[i] != pos:
+            res[pos : pos + n] = res[offsets[i] : offsets[i] + n]
+        pos += n
+    return res[:pos]
+
+
+# append block after the first rows of res, res grows geometrically and in
+# place where the allocator can, untouched capacity is never paged in
+def _append(res: NDArray, rows: int, block: NDArray) -> int:
+    end = rows + len(block)
+    if end > len(res):
+        res.resize((max(len(res) * 3 // 2, end), res.shape[1]), refcheck=False)
+    res[rows:end] = block
+    return end
+
+
+def _read_gzip(path: Path, n_columns: int, delimiter: str | None, workers: int) -> NDArray:
+    res = np.empty((0, n_columns))
+    rows = 0
+    with gzip.open(path, "rb") as f, _pool(workers) as pool:
+        pending: deque = deque()
+        line = 1
+        while True:
+            data = f.read(CHUNK_BYTES)
+            if not data:
+                break
+            # whole lines only, the cut line is completed from the stream
+            if not data.endswith(b"\n"):
+                data += f.readline()
+            pending.append(pool.submit(_parse, data, line, n_columns, delimiter))
+            line += data.count(b"\n")
+            # bound the decompressed text waiting to be parsed
+            if len(pending) > workers:
+                rows = _append(res, rows, pending.popleft().result())
+        while pending:
+            rows = _append(res, rows, pending.popleft().result())
+    res.resize((rows, n_columns), refcheck=False)
+    return res
+
+
+# read a (possibly gzip-compressed) text file of samples into a float array
+# of shape (rows, columns), bad lines raise ParseError with their line number
+def read_text(path: str | Path, delimiter: str | None = None, workers: int | None = None) -> NDArray:
+    path = Path(path)
+    if workers is None:
+        workers = os.cpu_count() or 1
+    compressed = _is_gzip(path)
+    opener = gzip.open if compressed else open
+    n_columns = _first_row(path, opener, delimiter)
+    if compressed:
+        return _read_gzip(path, n_columns, delimiter, workers)
+    return _read_plain(path, n_columns, delimiter, workers)
+
+
+# guess the delimiter from the first line with data, comma or whitespace
+def sniff_delimiter(path: str | Path) -> str | None:
+    path = Path(path)
+    opener = gzip.open if _is_gzip(path) else open
+    with opener(path, "rt") as f:
+        for line in f:
+            line = line.split(COMMENT, 1)[0]
+            if line.strip():
+                return "," if "," in line else None
+    return None
@@ -8,7 +8,7 @@ import numpy as np
 from matplotlib.figure import Figure
 from numpy.typing import NDArray
 
-from . import config
+from . import config, reader
 from .config import Parameters
 from .plot_handler import gen_hist, gen_sa_cdf
 
@@ -17,26 +17,30 @@ logger = logging.getLogger(__name__)
 # upload samples and draw histogram
 
 
-# read samples from given file path
+# read samples from given file path, a multi-column file gives a 2-D array,
+# a single column or a single line is one sample vector
 def _read_samples(filepath: str) -> NDArray | None:
     if not Path(filepath).is_file():
         logging.error("file not found")
         raise gr.Error("file not found", duration=config.msg_duration)
     try:
-        samples = np.squeeze(np.loadtxt(filepath))
+        delimiter = reader.sniff_delimiter(filepath)
+        samples = reader.read_text(filepath, delimiter=delimiter)
     except (IOError, OSError) as e:
         logging.error(f"Error loading file: {e}")
         raise gr.Error("cannot loading", duration=config.msg_duration)
+    except reader.ParseError as e:
+        logging.error(f"Error in file format: {e}")
+        gr.Warning(f"bad file format, {e}", duration=config.msg_duration)
+        return None
     except ValueError as e:
         logging.error(f"Error in file format: {e}")
         gr.Warning("bad file format", duration=config.msg_duration)
         return None
     except Exception:
         raise gr.Error("errors in server", duration=config.msg_duration)
-    if samples.ndim != 1:
-        samples = samples[:, 0]
-        logger.warning("samples is not 1-dimentional, the 1st column will be used")
-        gr.Warning("the 1st column will be used", duration=config.msg_duration)
+    if samples.shape[0] == 1 or samples.shape[1] == 1:
+        samples = samples.ravel()
     return samples
 
 
@@ -46,9 +50,8 @@ def _select_sample(samples: NDArray | None, num: int) -> NDArray | None:
     res = np.squeeze(samples)
     num_sample = num
     num_sample = min(num_sample, res.size)
-    np.random.shuffle(res)
-    res = res[: int(num_sample)]
-    return res
+    # a random subset, samples_all keeps its order
+    return np.random.default_rng().choice(res, size=int(num_sample), replace=False)
 
 
 def upload_samples(
@@ -58,11 +61,21 @@ def upload_samples(
     samples = _read_samples(filepath)
     if samples is None:
         return config.no_fig, config.no_fig, params
+    columns = None
+    if samples.ndim != 1:
+        columns = samples
+        samples = samples[:, 0]
+        logger.warning("samples is not 1-dimentional, the 1st column will be used")
+        gr.Warning("the 1st column will be used", duration=config.msg_duration)
     samples_plot = _select_sample(samples, params.samples_plot_num)
     if samples_plot is None:
         return config.no_fig, config.no_fig, params
     params.dist = None
+    params.fit_cache = None
+    # read-only, so that the fit cache hashes the samples once per upload
+    samples.flags.writeable = False
     params.samples_all = samples
+    params.samples_columns = columns
     params.samples_plot = samples_plot
     return gen_hist(samples, params), gen_sa_cdf(samples, params), params
 
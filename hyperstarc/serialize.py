@@ -0,0 +1,194 @@
+# versioned serialization of fitted distributions
+#
+# single models and small collections are stored as JSON, large collections
+# (or collections with big MAP matrices) as a packed NumPy .npz container
+# that loads directly into a DistBatch.
+
+import json
+from pathlib import Path
+
+import numpy as np
+
+from scipy import sparse
+
+from .dist import (MAP, AbcPhDist, Erlang, Exponential, HyperErlang,
+                   HyperErlangBranch, PhaseType)
+from .dist_batch import DistBatch
+
+FORMAT_NAME = "hyperstarc"
+FORMAT_VERSION = 1
+JSON_SUFFIX = ".json"
+NPZ_SUFFIX = ".npz"
+
+
+def _check_header(name: object, version: object) -> None:
+    if name != FORMAT_NAME:
+        raise ValueError("not a hyperstarc model file")
+    if not isinstance(version, int) or version < 1 or version > FORMAT_VERSION:
+        raise ValueError(f"unsupported model format version: {version}")
+
+
+# convert a distribution into a JSON-compatible dict
+def to_dict(dist: AbcPhDist) -> dict:
+    if isinstance(dist, Exponential):
+        return {"type": "Exponential", "rate": dist.rate}
+    if isinstance(dist, Erlang):
+        return {"type": "Erlang", "rate": dist.rate, "phase": dist.phase}
+    if isinstance(dist, HyperErlang):
+        branches = [
+            {"prob": b.prob, "rate": b.erlang.rate, "phase": b.erlang.phase}
+            for b in dist.branches
+        ]
+        return {"type": "HyperErlang", "branches": branches}
+    if isinstance(dist, MAP):
+        d0, d1 = dist.get_trans_matrix()
+        return {"type": "MAP", "d0": d0.tolist(), "d1": d1.tolist()}
+    if isinstance(dist, PhaseType):
+        return {"type": "PhaseType", "alpha": dist.get_alpha().tolist(), "trans": _dense(dist).tolist()}
+    raise ValueError(f"cannot serialize {type(dist).__name__}")
+
+
+# build a distribution from a dict created by to_dict
+def from_dict(data: dict) -> AbcPhDist:
+    kind = data.get("type")
+    if kind == "Exponential":
+        return Exponential(float(data["rate"]))
+    if kind == "Erlang":
+        return Erlang(float(data["rate"]), int(data["phase"]))
+    if kind == "HyperErlang":
+        branches = [
+            HyperErlangBranch(Erlang(float(b["rate"]), int(b["phase"])), float(b["prob"]))
+            for b in data["branches"]
+        ]
+        return HyperErlang(branches)
+    if kind == "MAP":
+        return MAP(np.array(data["d0"], dtype=float), np.array(data["d1"], dtype=float))
+    if kind == "PhaseType":
+        return PhaseType(np.array(data["alpha"], dtype=float), np.array(data["trans"], dtype=float))
+    raise ValueError(f"unknown distribution type: {kind}")
+
+
+def _dense(dist: PhaseType) -> np.ndarray:
+    trans = dist.get_trans_matrix()
+    return trans.toarray() if sparse.issparse(trans) else np.asarray(trans)
+
+
+def dumps(dist: AbcPhDist) -> str:
+    data = {"format": FORMAT_NAME, "version": FORMAT_VERSION, "model": to_dict(dist)}
+    return json.dumps(data)
+
+
+def loads(text: str) -> AbcPhDist:
+    data = json.loads(text)
+    _check_header(data.get("format"), data.get("version"))
+    return from_dict(data["model"])
+
+
+# save a collection of models, the container is chosen by file suffix
+def save_models(path: str | Path, models: dict[str, AbcPhDist]) -> None:
+    path = Path(path)
+    if path.suffix == NPZ_SUFFIX:
+        _save_npz(path, models)
+    elif path.suffix == JSON_SUFFIX:
+        data = {
+            "format": FORMAT_NAME,
+            "version": FORMAT_VERSION,
+            "models": {key: to_dict(dist) for key, dist in models.items()},
+        }
+        path.write_text(json.dumps(data), encoding="utf-8")
+    else:
+        raise ValueError(f"model file must end with {JSON_SUFFIX} or {NPZ_SUFFIX}")
+
+
+# load a collection of models as distribution objects
+def load_models(path: str | Path) -> dict[str, AbcPhDist]:
+    path = Path(path)
+    if path.suffix == NPZ_SUFFIX:
+        return load_batch(path).to_dists()
+    data = _read_json(path)
+    return {key: from_dict(item) for key, item in data["models"].items()}
+
+
+# load a collection of models straight into structure-of-arrays form
+def load_batch(path: str | Path) -> DistBatch:
+    path = Path(path)
+    if path.suffix == NPZ_SUFFIX:
+        return _load_npz(path)
+    return DistBatch.from_dists(load_models(path))
+
+
+def _read_json(path: Path) -> dict:
+    data = json.loads(path.read_text(encoding="utf-8"))
+    _check_header(data.get("format"), data.get("version"))
+    # a single model file is a collection of one
+    if "model" in data:
+        return {"models": {path.stem: data["model"]}}
+    return data
+
+
+# matrix models are packed as flat arrays: indices of the models, their
+# dimensions and the concatenated (row-major) matrices
+def _save_npz(path: Path, models: dict[str, AbcPhDist]) -> None:
+    batch = DistBatch.from_dists(models)
+    maps = {i: d for i, d in batch.others.items() if isinstance(d, MAP)}
+    phs = {i: d for i, d in batch.others.items() if isinstance(d, PhaseType)}
+    map_index = np.array(sorted(maps), dtype=np.int64)
+    ph_index = np.array(sorted(phs), dtype=np.int64)
+    np.savez_compressed(
+        path,
+        format=np.array(FORMAT_NAME),
+        version=np.array(FORMAT_VERSION),
+        ids=np.array(batch.ids, dtype=str),
+        types=np.array(batch.types, dtype=str),
+        offsets=batch.offsets,
+        prob=batch.prob,
+        rate=batch.rate,
+        phase=batch.phase,
+        map_index=map_index,
+        map_dims=np.array([maps[i].get_trans_matrix()[0].shape[0] for i in map_index], dtype=np.int64),
+        map_d0=_pack([maps[i].get_trans_matrix()[0] for i in map_index]),
+        map_d1=_pack([maps[i].get_trans_matrix()[1] for i in map_index]),
+        ph_index=ph_index,
+        ph_dims=np.array([phs[i].phase for i in ph_index], dtype=np.int64),
+        ph_alpha=_pack([phs[i].get_alpha() for i in ph_index]),
+        ph_trans=_pack([_dense(phs[i]) for i in ph_index]),
+    )
+
+
+def _pack(arrays: list[np.ndarray]) -> np.ndarray:
+    if not arrays:
+        return np.zeros(0)
+    return np.concatenate([np.ravel(a) for a in arrays])
+
+
+def _load_npz(path: Path) -> DistBatch:
+    with np.load(path, allow_pickle=False) as data:
+        _check_header(str(data["format"]), int(data["version"]))
+        # every lookup decompresses the whole member, read each once
+        map_d0, map_d1 = data["map_d0"], data["map_d1"]
+        ph_alpha, ph_trans = data["ph_alpha"], data["ph_trans"]
+        others: dict[int, AbcPhDist] = {}
+        pos = 0
+        for idx, dim in zip(data["map_index"], data["map_dims"]):
+            size = int(dim) ** 2
+            d0 = map_d0[pos : pos + size].reshape(dim, dim)
+            d1 = map_d1[pos : pos + size].reshape(dim, dim)
+            others[int(idx)] = MAP(d0, d1)
+            pos += size
+        pos, pos_alpha = 0, 0
+        for idx, dim in zip(data["ph_index"], data["ph_dims"]):
+            size = int(dim) ** 2
+            alpha = ph_alpha[pos_alpha : pos_alpha + dim]
+            trans = ph_trans[pos : pos + size].reshape(dim, dim)
+            others[int(idx)] = PhaseType(alpha, trans)
+            pos += size
+            pos_alpha += int(dim)
+        return DistBatch(
+            ids=data["ids"].tolist(),
+            types=data["types"].tolist(),
+            offsets=data["offsets"],
+            prob=data["prob"],
+            rate=data["rate"],
+            phase=data["phase"],
+            others=others,
+        )
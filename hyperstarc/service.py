@@ -0,0 +1,370 @@
+# headless HTTP service for fitting and evaluating distributions
+#
+#   POST   /fit                  fit samples, the model is kept by id
+#   POST   /models               register a serialized model
+#   GET    /models/<id>          serialized model
+#   DELETE /models/<id>          drop a model
+#   POST   /models/<id>/evaluate pdf, cdf or quantile of the model
+#   POST   /models/<id>/score    goodness of fit against samples
+#   GET    /metrics              request counts, latency and throughput
+#
+# bodies are JSON. concurrent evaluate requests for the same model and kind
+# are coalesced: while one batch is evaluated, new requests queue up and the
+# next batch evaluates all of them with a single vectorized call, run by the
+# thread of one of the queued requests.
+
+import argparse
+import dataclasses
+import json
+import logging
+import threading
+import time
+import uuid
+from collections import deque
+from concurrent.futures import Future
+from dataclasses import dataclass
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+from numpy.typing import NDArray
+
+from . import config, gof, serialize
+from .config import ERMD, FITTERS, ROUNDING
+from .dist import AbcPhDist
+from .dist_batch import DistBatch
+from .fit_handler import make_fitter
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8000
+EVALUATE_KINDS = ("pdf", "cdf", "quantile")
+# latencies kept per route for the percentiles
+LATENCY_WINDOW = 1000
+# fitter parameters a fit request may set, with their converters
+FIT_PARAMS = {
+    "erlang_method": ERMD,
+    "erlang_rounding": ROUNDING,
+    "erlang_max_phase": int,
+    "herlang_peaks": int,
+    "herlang_method": ERMD,
+    "herlang_rounding": ROUNDING,
+    "herlang_max_phase": int,
+    "herlang_phase_budget": int,
+}
+
+
+class NotFound(KeyError):
+    pass
+
+
+@dataclass
+class _Model:
+    dist: AbcPhDist
+    batch: DistBatch
+
+
+class ModelStore:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._models: dict[str, _Model] = {}
+
+    def add(self, dist: AbcPhDist) -> str:
+        model_id = uuid.uuid4().hex
+        with self._lock:
+            self._models[model_id] = _Model(dist, DistBatch.from_dists([dist]))
+        return model_id
+
+    def get(self, model_id: str) -> _Model:
+        with self._lock:
+            model = self._models.get(model_id)
+        if model is None:
+            raise NotFound(f"unknown model {model_id}")
+        return model
+
+    def remove(self, model_id: str) -> None:
+        with self._lock:
+            if self._models.pop(model_id, None) is None:
+                raise NotFound(f"unknown model {model_id}")
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._models)
+
+
+def _evaluate(batch: DistBatch, kind: str, x: NDArray) -> NDArray:
+    if kind == "pdf":
+        return batch.pdf(x)[0]
+    if kind == "cdf":
+        return batch.cdf(x)[0]
+    return batch.quantile(x)[0]
+
+
+# evaluates the queued requests of a (model, kind) pair as one batch. the
+# thread that finds no batch running evaluates the queue once, then hands
+# over to the oldest request queued meanwhile, so no thread keeps serving
+# other requests under load
+class Coalescer:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._pending: dict[tuple[str, str], list[tuple[NDArray, Future, threading.Event]]] = {}
+        self._running: set[tuple[str, str]] = set()
+        self.requests = 0
+        self.batches = 0
+        self.points = 0
+
+    def evaluate(self, model_id: str, model: _Model, kind: str, x: NDArray) -> NDArray:
+        key = (model_id, kind)
+        future: Future = Future()
+        # set when the result is ready or when this request leads the next batch
+        wake = threading.Event()
+        with self._lock:
+            self._pending.setdefault(key, []).append((x, future, wake))
+            lead = key not in self._running
+            if lead:
+                self._running.add(key)
+        if not lead:
+            wake.wait()
+        if not future.done():
+            self._batch(key, model)
+        return future.result()
+
+    def _batch(self, key: tuple[str, str], model: _Model) -> None:
+        with self._lock:
+            queued = self._pending.pop(key)
+            self.requests += len(queued)
+            self.batches += 1
+            self.points += sum(x.size for x, _, _ in queued)
+        try:
+            values = _evaluate(model.batch, key[1], np.concatenate([x for x, _, _ in queued]))
+        except Exception as e:
+            for _, future, _ in queued:
+                future.set_exception(e)
+        else:
+            ends = np.cumsum([x.size for x, _, _ in queued])
+            for (_, future, _), part in zip(queued, np.split(values, ends[:-1])):
+                future.set_result(part)
+        for _, _, wake in queued:
+            wake.set()
+        with self._lock:
+            waiting = self._pending.get(key)
+            if waiting:
+                waiting[0][2].set()
+            else:
+                self._running.discard(key)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "batches": self.batches,
+                "points": self.points,
+                "requests_per_batch": self.requests / self.batches if self.batches else 0.0,
+            }
+
+
+class Metrics:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._start = time.perf_counter()
+        self._count: dict[str, int] = {}
+        self._errors: dict[str, int] = {}
+        self._latency: dict[str, deque] = {}
+
+    def record(self, route: str, seconds: float, ok: bool) -> None:
+        with self._lock:
+            self._count[route] = self._count.get(route, 0) + 1
+            if not ok:
+                self._errors[route] = self._errors.get(route, 0) + 1
+            self._latency.setdefault(route, deque(maxlen=LATENCY_WINDOW)).append(seconds)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            uptime = time.perf_counter() - self._start
+            routes = {}
+            for route, count in self._count.items():
+                ms = np.array(self._latency[route]) * 1000
+                p50, p95, p99 = np.percentile(ms, [50, 95, 99])
+                routes[route] = {
+                    "requests": count,
+                    "errors": self._errors.get(route, 0),
+                    "per_second": count / uptime,
+                    "latency_ms": {
+                        "mean": float(ms.mean()),
+                        "p50": float(p50),
+                        "p95": float(p95),
+                        "p99": float(p99),
+                    },
+                }
+            total = sum(self._count.values())
+        return {"uptime": uptime, "requests": total, "per_second": total / uptime, "routes": routes}
+
+
+def _array(body: dict, key: str) -> NDArray:
+    if key not in body:
+        raise ValueError(f"missing '{key}'")
+    values = np.asarray(body[key], dtype=float)
+    if values.ndim != 1 or values.size == 0:
+        raise ValueError(f"'{key}' must be a non-empty list of numbers")
+    return values
+
+
+def _fit_params(body: dict) -> config.Parameters:
+    try:
+        selected = FITTERS(body.get("fitter", FITTERS.Exponential.value))
+    except ValueError:
+        raise ValueError(f"unknown fitter {body.get('fitter')!r}")
+    changes = {}
+    for key, value in body.get("params", {}).items():
+        if key not in FIT_PARAMS:
+            raise ValueError(f"unknown fitter parameter {key!r}")
+        changes[key] = FIT_PARAMS[key](value)
+    return dataclasses.replace(config.default_param, fitter_selected=selected, **changes)
+
+
+class FitService:
+    def __init__(self) -> None:
+        self.models = ModelStore()
+        self.coalescer = Coalescer()
+        self.metrics = Metrics()
+
+    def fit(self, body: dict) -> dict:
+        samples = _array(body, "samples")
+        weights = _array(body, "weights") if "weights" in body else None
+        params = _fit_params(body)
+        fitter = make_fitter(params)
+        if fitter is None:
+            raise ValueError(f"fitter {params.fitter_selected.value} is not supported")
+        dist = fitter.fit(samples, weights)
+        return {"id": self.models.add(dist), "model": serialize.to_dict(dist)}
+
+    def register(self, body: dict) -> dict:
+        dist = serialize.from_dict(body.get("model", {}))
+        return {"id": self.models.add(dist)}
+
+    def model(self, model_id: str) -> dict:
+        return {"id": model_id, "model": serialize.to_dict(self.models.get(model_id).dist)}
+
+    def delete(self, model_id: str) -> dict:
+        self.models.remove(model_id)
+        return {"id": model_id}
+
+    def evaluate(self, model_id: str, body: dict) -> dict:
+        model = self.models.get(model_id)
+        kind = body.get("kind")
+        if kind not in EVALUATE_KINDS:
+            raise ValueError(f"kind must be one of {', '.join(EVALUATE_KINDS)}")
+        x = _array(body, "x")
+        # checked here so that a bad request cannot fail its batch
+        if kind == "quantile" and np.any((x < 0) | (x >= 1)):
+            raise ValueError("quantiles must be in [0, 1)")
+        values = self.coalescer.evaluate(model_id, model, kind, x)
+        return {"id": model_id, "kind": kind, "values": values.tolist()}
+
+    def score(self, model_id: str, body: dict) -> dict:
+        model = self.models.get(model_id)
+        samples = _array(body, "samples")
+        bins = int(body.get("bins", gof.DEFAULT_BINS))
+        result = gof.evaluate(samples, {model_id: model.dist}, bins=bins)[0]
+        return dataclasses.asdict(result)
+
+    def stats(self) -> dict:
+        res = self.metrics.snapshot()
+        res["models"] = len(self.models)
+        res["coalescing"] = self.coalescer.snapshot()
+        return res
+
+    # (route name, handler) of a request, the handler takes the JSON body
+    def route(self, method: str, path: str):
+        parts = [p for p in path.split("?", 1)[0].split("/") if p]
+        if method == "GET" and parts == ["metrics"]:
+            return "metrics", lambda body: self.stats()
+        if method == "POST" and parts == ["fit"]:
+            return "fit", self.fit
+        if method == "POST" and parts == ["models"]:
+            return "register", self.register
+        if len(parts) == 2 and parts[0] == "models":
+            if method == "GET":
+                return "model", lambda body: self.model(parts[1])
+            if method == "DELETE":
+                return "delete", lambda body: self.delete(parts[1])
+        if method == "POST" and len(parts) == 3 and parts[0] == "models":
+            if parts[2] == "evaluate":
+                return "evaluate", lambda body: self.evaluate(parts[1], body)
+            if parts[2] == "score":
+                return "score", lambda body: self.score(parts[1], body)
+        return None
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server: "FitServer"
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self) -> None:
+        self._handle("GET")
+
+    def do_POST(self) -> None:
+        self._handle("POST")
+
+    def do_DELETE(self) -> None:
+        self._handle("DELETE")
+
+    def _handle(self, method: str) -> None:
+        service = self.server.service
+        start = time.perf_counter()
+        found = service.route(method, self.path)
+        route = "unknown" if found is None else found[0]
+        # the body is always consumed, the connection is kept alive
+        length = int(self.headers.get("Content-Length") or 0)
+        raw = self.rfile.read(length)
+        try:
+            if found is None:
+                raise NotFound(f"no route for {method} {self.path}")
+            body = json.loads(raw or b"{}")
+            if not isinstance(body, dict):
+                raise ValueError("body must be a JSON object")
+            status, res = HTTPStatus.OK, found[1](body)
+        except NotFound as e:
+            status, res = HTTPStatus.NOT_FOUND, {"error": e.args[0]}
+        except (ValueError, TypeError, KeyError) as e:
+            status, res = HTTPStatus.BAD_REQUEST, {"error": str(e)}
+        except Exception as e:
+            logger.exception("request failed")
+            status, res = HTTPStatus.INTERNAL_SERVER_ERROR, {"error": str(e)}
+        data = json.dumps(res).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+        service.metrics.record(route, time.perf_counter() - start, status == HTTPStatus.OK)
+
+    def log_message(self, format: str, *args) -> None:
+        logger.debug(format, *args)
+
+
+class FitServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # listen backlog, the default of 5 refuses bursts of concurrent clients
+    request_queue_size = 128
+
+    def __init__(self, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT) -> None:
+        super().__init__((host, port), _Handler)
+        self.service = FitService()
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="HyperStarC fitting service")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    args = parser.parse_args()
+    logging.basicConfig(level=config.LOG_LEVEL)
+    with FitServer(args.host, args.port) as server:
+        logger.info(f"serving on {server.url}")
+        server.serve_forever()
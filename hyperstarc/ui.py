@@ -1,14 +1,17 @@
 import gradio as gr
 
-from . import config
+from . import column_fit, config, gof
+from .column_handler import columns_change, fit_columns_click
 from .config import Parameters
 from .erlang_handler import (er_fit_md_change, er_max_phase_change,
                              er_round_change)
-from .herlang_handler import (her_fit_md_change, her_max_phase_change, her_peaks_change, her_round_change)
-from .fit_handler import fit_click, fitter_change, export_click
+from .herlang_handler import (her_budget_change, her_fit_md_change, her_max_phase_change, her_peaks_change, her_round_change)
+from .fit_handler import compare_click, export_click, fit_click, fitter_change
 from .plot_handler import (bins_num_change, max_x_change, min_x_change,
                            replot_click)
 from .sam_handler import sample_num_change, upload_samples
+from .window_handler import (fit_windows_click, window_size_change,
+                             window_stride_change)
 
 page = gr.Blocks(title="HyperStarC")
 
@@ -21,6 +24,9 @@ with page:
             pdf_plot = gr.Plot(label="PDF", visible=True)
             cdf_plot = gr.Plot(label="CDF", visible=True)
             corr_plot = gr.Plot(label="Correlation", visible=False)
+            window_plot = gr.Plot(label="Windowed fit", visible=True)
+            gof_table = gr.Dataframe(headers=gof.REPORT_HEADERS, label="Goodness of fit")
+            column_table = gr.Dataframe(headers=column_fit.COLUMN_HEADERS, label="Columns")
 
         with gr.Column(scale=1):
             load_btn = gr.UploadButton("Load Samples")
@@ -63,12 +69,29 @@ with page:
                 her_max_phase = gr.Number(
                     value=config.default_param.herlang_max_phase, label="max phase", interactive=True
                 )
+                her_budget = gr.Number(
+                    value=config.default_param.herlang_phase_budget, label="phase budget (0 for none)", interactive=True
+                )
             with gr.Row(visible=False) as map_block:
                 gr.Markdown("## map block")
             with gr.Row(visible=True) as fitter_block:
                 dl_file = gr.File(label="Download result")
                 fit_btn = gr.Button("Fit")
+                compare_btn = gr.Button("Compare")
                 export_btn = gr.Button("Export")
+            with gr.Row(visible=True) as column_block:
+                fit_columns = gr.Textbox(
+                    value=config.default_param.fit_columns, label="columns (empty for all)", interactive=True
+                )
+                fit_columns_btn = gr.Button("Fit Columns")
+            with gr.Row(visible=True) as window_block:
+                window_size = gr.Number(
+                    value=config.default_param.window_size, label="window size", interactive=True
+                )
+                window_stride = gr.Number(
+                    value=config.default_param.window_stride, label="window stride", interactive=True
+                )
+                fit_windows_btn = gr.Button("Fit Windows")
 
     # set event handlers
     fitter_dropdown.change(
@@ -82,6 +105,12 @@ with page:
     load_btn.upload(fn=upload_samples, inputs=[load_btn, params], outputs=(pdf_plot, cdf_plot, params))
     replot_btn.click(fn=replot_click, inputs=[params], outputs=(pdf_plot, cdf_plot))
     fit_btn.click(fn=fit_click, inputs=[params], outputs=(pdf_plot, cdf_plot, params))
+    compare_btn.click(fn=compare_click, inputs=[params], outputs=(gof_table, params))
+    fit_columns.change(fn=columns_change, inputs=[fit_columns, params], outputs=params)
+    fit_columns_btn.click(fn=fit_columns_click, inputs=[params], outputs=(column_table, dl_file))
+    window_size.change(fn=window_size_change, inputs=[window_size, params], outputs=params)
+    window_stride.change(fn=window_stride_change, inputs=[window_stride, params], outputs=params)
+    fit_windows_btn.click(fn=fit_windows_click, inputs=[params], outputs=window_plot)
 
 
     er_fit_md.change(fn=er_fit_md_change, inputs=[er_fit_md, params], outputs=params)
@@ -92,6 +121,7 @@ with page:
     her_fit_md.change(fn=her_fit_md_change, inputs=[her_fit_md, params], outputs=params)
     her_round.change(fn=her_round_change, inputs=[her_round, params], outputs=params)
     her_max_phase.change(fn=her_max_phase_change, inputs=[her_max_phase, params], outputs=params)
+    her_budget.change(fn=her_budget_change, inputs=[her_budget, params], outputs=params)
 
     bins_num.change(fn=bins_num_change, inputs=[bins_num, params], outputs=params)
     max_x.change(fn=max_x_change, inputs=[max_x, params], outputs=params)
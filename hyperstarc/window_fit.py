@@ -0,0 +1,104 @@
+# refit exponential/erlang parameters over sliding windows of a trace
+#
+# running sums of x, x^2 and log x are kept as prefix sums, so the
+# statistics of a window are a difference of two prefix entries and moving
+# the window by a stride costs O(stride) (the samples that enter and leave)
+# no matter how large the window is. all windows are then fitted with one
+# vectorized call of the fitter.
+
+from dataclasses import dataclass
+
+import numpy as np
+from numpy.typing import NDArray
+
+from .fitters import ErlangFitter, ExponentialFitter, SampleStats
+
+
+@dataclass
+class WindowFits:
+    # position of each window, sample index or time
+    starts: NDArray
+    rate: NDArray
+    phase: NDArray
+    count: NDArray
+
+
+class _PrefixStats:
+    def __init__(self, trace: NDArray) -> None:
+        if trace.ndim != 1:
+            raise ValueError("trace must be 1-dimentional")
+
+        def prefix(values: NDArray) -> NDArray:
+            res = np.zeros(values.size + 1)
+            np.cumsum(values, out=res[1:])
+            return res
+
+        self.total = prefix(trace)
+        self.total_sq = prefix(trace * trace)
+        # log x is -inf for zero gaps (timestamp ties), they are counted
+        # apart so that they only affect the windows holding them
+        positive = trace > 0
+        self.total_log = prefix(np.log(trace, out=np.zeros(trace.size), where=positive))
+        self.non_positive = prefix(~positive)
+
+    # statistics of trace[lo:hi] for arrays of bounds
+    def window(self, lo: NDArray, hi: NDArray) -> SampleStats:
+        return SampleStats(
+            (hi - lo).astype(float),
+            self.total[hi] - self.total[lo],
+            self.total_sq[hi] - self.total_sq[lo],
+            np.where(
+                self.non_positive[hi] > self.non_positive[lo],
+                -np.inf,
+                self.total_log[hi] - self.total_log[lo],
+            ),
+        )
+
+
+def _fit(
+    fitter: ExponentialFitter | ErlangFitter, stats: SampleStats, starts: NDArray
+) -> WindowFits:
+    if isinstance(fitter, ErlangFitter):
+        rate, phase = fitter.fit_params(stats)
+    elif isinstance(fitter, ExponentialFitter):
+        rate = fitter.fit_params(stats)
+        phase = np.ones_like(rate)
+    else:
+        raise ValueError("windowed fitting supports Exponential and Erlang fitters")
+    return WindowFits(starts, rate, phase.astype(int), stats.count.astype(int))
+
+
+# fit windows of `window` samples, moving by `stride` samples
+def fit_windows(
+    trace: NDArray,
+    window: int,
+    stride: int,
+    fitter: ExponentialFitter | ErlangFitter,
+) -> WindowFits:
+    if window < 1 or stride < 1:
+        raise ValueError("window and stride must be positive")
+    if window > trace.size:
+        raise ValueError("window is larger than the trace")
+    prefix = _PrefixStats(trace)
+    lo = np.arange(0, trace.size - window + 1, stride)
+    return _fit(fitter, prefix.window(lo, lo + window), lo)
+
+
+# fit time slices of the trace, samples are inter-arrival times and a slice
+# holds the samples arriving in [t, t + duration), t moves by `stride`
+def fit_time_windows(
+    trace: NDArray,
+    duration: float,
+    stride: float,
+    fitter: ExponentialFitter | ErlangFitter,
+) -> WindowFits:
+    if duration <= 0 or stride <= 0:
+        raise ValueError("duration and stride must be positive")
+    prefix = _PrefixStats(trace)
+    arrivals = np.cumsum(trace)
+    starts = np.arange(0.0, arrivals[-1] - duration + stride, stride)
+    lo = np.searchsorted(arrivals, starts, side="left")
+    hi = np.searchsorted(arrivals, starts + duration, side="left")
+    # slices without samples have no fit
+    used = hi > lo
+    return _fit(fitter, prefix.window(lo[used], hi[used]), starts[used])
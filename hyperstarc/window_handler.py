@@ -0,0 +1,46 @@
+import logging
+
+import gradio as gr
+from matplotlib.figure import Figure
+
+from . import config
+from .config import Parameters
+from .fit_handler import make_fitter
+from .fitters import ErlangFitter, ExponentialFitter
+from .plot_handler import gen_window_plot
+from .window_fit import fit_windows
+
+logger = logging.getLogger(__name__)
+
+
+# event handler for window size
+def window_size_change(size: int, params: Parameters) -> Parameters:
+    params.window_size = max(int(size), 1)
+    return params
+
+
+# event handler for window stride
+def window_stride_change(stride: int, params: Parameters) -> Parameters:
+    params.window_stride = max(int(stride), 1)
+    return params
+
+
+# event handler for fit windows button
+def fit_windows_click(params: Parameters) -> Figure:
+    if params.samples_all is None:
+        logger.error("No samples loaded")
+        gr.Warning("No samples loaded", duration=config.msg_duration)
+        return config.no_fig
+    fitter = make_fitter(params)
+    if not isinstance(fitter, (ExponentialFitter, ErlangFitter)):
+        logger.error("windowed fitting needs an Exponential or Erlang fitter")
+        gr.Warning("select Exponential or Erlang", duration=config.msg_duration)
+        return config.no_fig
+    # samples_all keeps the order of the uploaded trace
+    try:
+        fits = fit_windows(params.samples_all, params.window_size, params.window_stride, fitter)
+    except ValueError as e:
+        logger.error(str(e))
+        gr.Warning(str(e), duration=config.msg_duration)
+        return config.no_fig
+    return gen_window_plot(fits)
@@ -0,0 +1,43 @@
+import numpy as np
+import pytest
+
+from hyperstarc.bootstrap import bootstrap
+from hyperstarc.fitters import (ErlangFitter, ExponentialFitter,
+                                HyperErlangFitter)
+
+
+def test_erlang_intervals():
+    samples = np.random.default_rng(9).gamma(4.0, 0.25, 20_000)
+    res = bootstrap(ErlangFitter(), samples, replicates=200, seed=1, workers=1)
+    assert res.names == ["rate", "phase", "mean", "p99"]
+    assert res.replicates.shape == (200, 4)
+    intervals = {i.name: i for i in res.intervals(0.95)}
+    assert intervals["rate"].low < 4.0 < intervals["rate"].high
+    assert intervals["mean"].low <= np.mean(samples) <= intervals["mean"].high
+    assert intervals["p99"].low < intervals["p99"].estimate < intervals["p99"].high
+
+
+def test_seeded_and_parallel():
+    samples = np.random.default_rng(10).exponential(2.0, 5000)
+    a = bootstrap(ExponentialFitter(), samples, replicates=60, seed=3, workers=1)
+    b = bootstrap(ExponentialFitter(), samples, replicates=60, seed=3, workers=2)
+    c = bootstrap(ExponentialFitter(), samples, replicates=60, seed=3, workers=3)
+    assert a.replicates.shape == (60, 3)
+    assert a.estimate == pytest.approx(b.estimate)
+    assert np.array_equal(a.replicates, b.replicates)
+    assert np.array_equal(a.replicates, c.replicates)
+    assert np.all(a.replicates[:, 0] > 0)
+
+
+def test_weighted_and_hyper_erlang():
+    rng = np.random.default_rng(11)
+    samples = np.concatenate([rng.gamma(2.0, 0.1, 1000), rng.gamma(10.0, 0.2, 1000)])
+    counts, edges = np.histogram(samples, bins=100)
+    mids = (edges[:-1] + edges[1:]) / 2
+    res = bootstrap(ErlangFitter(), mids, weights=counts.astype(float), replicates=50, seed=2, workers=1)
+    assert res.replicates.shape == (50, 4)
+    res = bootstrap(HyperErlangFitter(peaks=2), samples, replicates=8, seed=2, workers=1)
+    assert res.names[:3] == ["prob0", "rate0", "phase0"]
+    assert res.replicates.shape == (8, 8)
+    with pytest.raises(ValueError):
+        res.intervals(1.5)
@@ -0,0 +1,31 @@
+import numpy as np
+import pytest
+
+from hyperstarc import column_fit, serialize
+from hyperstarc.dist import Erlang
+from hyperstarc.fitters import ErlangFitter
+
+
+def test_parse_columns():
+    assert column_fit.parse_columns("", 3) == [0, 1, 2]
+    assert column_fit.parse_columns("all", 2) == [0, 1]
+    assert column_fit.parse_columns("2, 0", 3) == [2, 0]
+    with pytest.raises(ValueError):
+        column_fit.parse_columns("3", 3)
+    with pytest.raises(ValueError):
+        column_fit.parse_columns("a", 3)
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_fit_columns(tmp_path, workers):
+    rng = np.random.default_rng(6)
+    samples = np.column_stack([rng.gamma(k, 0.5, 3000) for k in (1, 4, 9)])
+    results = column_fit.fit_columns(samples, ErlangFitter(), columns=[0, 2], workers=workers)
+    assert [r.column for r in results] == ["col0", "col2"]
+    assert all(isinstance(r.dist, Erlang) for r in results)
+    assert results[1].dist.phase == pytest.approx(9, abs=1)
+    rows = column_fit.to_rows(results)
+    assert len(rows[0]) == len(column_fit.COLUMN_HEADERS)
+    path = tmp_path / "columns.json"
+    column_fit.export(results, path)
+    assert list(serialize.load_models(path)) == ["col0", "col2"]
@@ -1,9 +1,10 @@
 import numpy as np
 import pytest
+from scipy import linalg, sparse
 from scipy.stats import erlang
 
 from hyperstarc.dist import (MAP, Erlang, Exponential, HyperErlang,
-                             HyperErlangBranch)
+                             HyperErlangBranch, PhaseType)
 
 
 def test_exponential():
@@ -53,3 +54,30 @@ def test_map():
     assert dist.var > 0
     assert isinstance(dist.get_trans_matrix(), tuple)
     assert dist.get_limit_prob().shape == (2, 2)
+
+
+def test_phase_type():
+    e1 = Erlang(rate=1.5, phase=2)
+    e2 = Erlang(rate=4.0, phase=3)
+    her = HyperErlang([HyperErlangBranch(e1, prob=0.3), HyperErlangBranch(e2, prob=0.7)])
+    dist = PhaseType(her.get_alpha(), her.get_trans_matrix())
+    x = np.array([2.0, 0.0, 0.5, 1.0, 7.0])
+    assert dist.pdfs(x) == pytest.approx(her.pdfs(x))
+    assert dist.cdfs(x) == pytest.approx(her.cdfs(x))
+    assert dist.mean == pytest.approx(her.mean)
+    assert dist.var == pytest.approx(her.var)
+    sparse_dist = PhaseType(her.get_alpha(), sparse.csr_matrix(her.get_trans_matrix()))
+    assert sparse_dist.cdf(1.0) == pytest.approx(her.cdf(1.0))
+    assert sparse_dist.get_moment(3) == pytest.approx(her.get_moment(3))
+
+
+def test_map_grid():
+    D0 = np.array([[-5.0, 2.0], [1.0, -3.0]])
+    D1 = np.array([[3.0, 0.0], [0.0, 2.0]])
+    dist = MAP(d0=D0, d1=D1)
+    pi = dist.get_limit_prob()[0]
+    x = np.linspace(0.0, 2.0, 9)
+    exit_rates = -D0 @ np.ones(2)
+    expected = [pi @ linalg.expm(D0 * v) @ exit_rates for v in x]
+    assert dist.pdfs(x) == pytest.approx(expected)
+    assert dist.cdf(0.3) == pytest.approx(1 - pi @ linalg.expm(D0 * 0.3) @ np.ones(2))
@@ -0,0 +1,197 @@
+import numpy as np
+import pytest
+
+from hyperstarc.config import ERMD, ROUNDING
+from hyperstarc.dist import Erlang, Exponential, HyperErlang
+from hyperstarc import fitters, gof
+from hyperstarc.fitters import (ErlangFitter, ExponentialFitter, FitCache,
+                                HyperErlangFitter, SampleStats)
+
+
+def test_sample_stats():
+    samples = np.array([1.0, 2.0, 4.0])
+    stats = SampleStats.from_samples(samples)
+    assert stats.mean == pytest.approx(np.mean(samples))
+    assert stats.var == pytest.approx(np.var(samples))
+    assert stats.mean_log == pytest.approx(np.mean(np.log(samples)))
+
+
+@pytest.mark.parametrize("weighted", [False, True])
+def test_grouped_stats(weighted):
+    rng = np.random.default_rng(0)
+    samples = rng.exponential(size=200)
+    labels = rng.integers(0, 4, samples.size)
+    weights = rng.uniform(0.5, 2.0, samples.size) if weighted else None
+    stats = SampleStats.grouped(samples, labels, 5, weights)
+    assert stats.count[4] == 0
+    # means over the empty group are nan, only the others are compared
+    stats = SampleStats(stats.count[:4], stats.total[:4], stats.total_sq[:4], stats.total_log[:4])
+    for i in range(4):
+        mask = labels == i
+        expected = SampleStats.from_samples(samples[mask], None if weights is None else weights[mask])
+        assert stats.count[i] == pytest.approx(expected.count)
+        assert stats.mean[i] == pytest.approx(expected.mean)
+        assert stats.var[i] == pytest.approx(expected.var)
+        assert stats.mean_log[i] == pytest.approx(expected.mean_log)
+
+
+@pytest.mark.parametrize(
+    "fitter",
+    [ExponentialFitter(), ErlangFitter(method=ERMD.MLE), ErlangFitter(method=ERMD.MOM)],
+)
+def test_weighted_equals_repeated(fitter):
+    rng = np.random.default_rng(3)
+    values = rng.gamma(4.0, 0.5, 200)
+    counts = rng.integers(1, 5, values.size)
+    weighted = fitter.fit(values, counts)
+    repeated = fitter.fit(np.repeat(values, counts))
+    assert weighted.rate == pytest.approx(repeated.rate)
+    assert weighted.mean == pytest.approx(repeated.mean)
+
+
+def test_fit_hist():
+    rng = np.random.default_rng(4)
+    samples = rng.gamma(6.0, 0.25, 100_000)
+    counts, edges = np.histogram(samples, bins=400)
+    dist = ErlangFitter().fit_hist(edges, counts)
+    assert isinstance(dist, Erlang)
+    assert dist.phase == pytest.approx(6, abs=1)
+    assert dist.mean == pytest.approx(np.mean(samples), rel=1e-2)
+    with pytest.raises(ValueError):
+        ExponentialFitter().fit_hist(edges[:-1], counts)
+
+
+def test_hyper_erlang_weighted():
+    rng = np.random.default_rng(5)
+    samples = np.concatenate([rng.gamma(2.0, 0.1, 3000), rng.gamma(10.0, 0.2, 3000)])
+    counts, edges = np.histogram(samples, bins=300)
+    dist = HyperErlangFitter(peaks=2).fit_hist(edges, counts)
+    assert isinstance(dist, HyperErlang)
+    assert sum(b.prob for b in dist.branches) == pytest.approx(1.0)
+    assert dist.mean == pytest.approx(np.mean(samples), rel=2e-2)
+
+
+def test_bad_weights():
+    with pytest.raises(ValueError):
+        ExponentialFitter().fit(np.ones(3), np.array([1.0, -1.0, 1.0]))
+    assert isinstance(ExponentialFitter().fit(np.ones(3)), Exponential)
+
+
+def test_exact_phase_maximizes_likelihood():
+    rng = np.random.default_rng(12)
+    samples = rng.gamma(3.4, 0.5, 500)
+    fitter = ErlangFitter(rounding=ROUNDING.exact, max_phase=50)
+    dist = fitter.fit(samples)
+    llh = [Erlang(k / np.mean(samples), k).llh(samples) for k in range(1, 51)]
+    assert dist.phase == int(np.argmax(llh)) + 1
+    assert dist.llh(samples) >= ErlangFitter(rounding=ROUNDING.round).fit(samples).llh(samples)
+
+
+def test_exact_rounding_keeps_mom():
+    # lognormal samples, where the moment and likelihood phases differ
+    samples = np.random.default_rng(14).lognormal(0.0, 0.3, 500)
+    dist = ErlangFitter(method=ERMD.MOM, rounding=ROUNDING.exact).fit(samples)
+    assert dist.phase == round(np.mean(samples) ** 2 / np.var(samples))
+    assert dist.phase != ErlangFitter(method=ERMD.MLE, rounding=ROUNDING.exact).fit(samples).phase
+
+
+def test_exact_phase_vectorized():
+    rng = np.random.default_rng(13)
+    groups = [rng.gamma(k, 1.0, 400) for k in (1, 5, 20)]
+    stats = SampleStats(
+        np.array([g.size for g in groups], dtype=float),
+        np.array([g.sum() for g in groups]),
+        np.array([(g * g).sum() for g in groups]),
+        np.array([np.log(g).sum() for g in groups]),
+    )
+    fitter = ErlangFitter(rounding=ROUNDING.exact)
+    _, phase = fitter.fit_params(stats)
+    assert phase.tolist() == [fitter.fit(g).phase for g in groups]
+
+
+def _two_peaks(rng):
+    return np.concatenate([rng.gamma(4, 0.25, 3000), rng.gamma(9, 1.0, 3000)])
+
+
+def test_cache_skips_reclustering(monkeypatch):
+    samples = _two_peaks(np.random.default_rng(0))
+    cache = FitCache()
+    first = HyperErlangFitter(peaks=2, rounding=ROUNDING.exact, cache=cache).fit(samples)
+    calls = []
+    monkeypatch.setattr(fitters, "KMeans", lambda **kw: calls.append(kw))
+    for rounding in ROUNDING:
+        HyperErlangFitter(peaks=2, rounding=rounding, max_phase=5, cache=cache).fit(samples)
+    again = HyperErlangFitter(peaks=2, rounding=ROUNDING.exact, cache=cache).fit(samples)
+    assert calls == []
+    assert again.mean == pytest.approx(first.mean)
+    # erlang fits reuse the statistics of the whole sample set
+    assert ErlangFitter(cache=cache).fit(samples).mean == pytest.approx(np.mean(samples))
+
+
+def test_cache_seeds_from_fewer_peaks(monkeypatch):
+    samples = _two_peaks(np.random.default_rng(1))
+    cache = FitCache()
+    HyperErlangFitter(peaks=2, cache=cache).fit(samples)
+    inits = []
+    kmeans = fitters.KMeans
+
+    def spy(**kw):
+        inits.append(kw.get("init"))
+        return kmeans(**kw)
+
+    monkeypatch.setattr(fitters, "KMeans", spy)
+    dist = HyperErlangFitter(peaks=3, cache=cache).fit(samples)
+    assert len(dist.branches) == 3
+    seed = inits[0].ravel()
+    assert seed.size == 3
+    assert set(cache.clusters[2].centers) <= set(seed)
+
+
+def test_cache_rebinds_on_new_samples():
+    rng = np.random.default_rng(2)
+    cache = FitCache()
+    ExponentialFitter(cache=cache).fit(rng.exponential(1.0, 1000))
+    other = rng.exponential(5.0, 1000)
+    assert ExponentialFitter(cache=cache).fit(other).mean == pytest.approx(np.mean(other))
+
+
+def test_cache_rebuilds_after_in_place_shuffle():
+    rng = np.random.default_rng(3)
+    samples = _two_peaks(rng)
+    cache = FitCache()
+    HyperErlangFitter(peaks=2, cache=cache).fit(samples)
+    rng.shuffle(samples)
+    dist = HyperErlangFitter(peaks=3, cache=cache).fit(samples)
+    assert list(cache.clusters) == [3]
+    state = cache.clusters[3]
+    expected = SampleStats.grouped(samples, state.labels, 3)
+    np.testing.assert_allclose(state.stats.total_log, expected.total_log)
+    assert all(b.erlang.phase < 1000 for b in dist.branches)
+
+
+def test_cache_hashes_read_only_samples_once(monkeypatch):
+    samples = _two_peaks(np.random.default_rng(4))
+    calls = []
+    fingerprint = fitters._fingerprint
+    monkeypatch.setattr(fitters, "_fingerprint", lambda *args: calls.append(1) or fingerprint(*args))
+    cache = FitCache()
+    for _ in range(3):
+        ErlangFitter(cache=cache).fit(samples)
+    assert len(calls) == 3
+    samples = samples.copy()
+    samples.flags.writeable = False
+    cache = FitCache()
+    for peaks in (2, 3, 4):
+        HyperErlangFitter(peaks=peaks, cache=cache).fit(samples)
+    assert len(calls) == 4
+    assert sorted(cache.clusters) == [2, 3, 4]
+
+
+def test_cache_shared_by_concurrent_fits():
+    samples = _two_peaks(np.random.default_rng(5))
+    samples.flags.writeable = False
+    cache = FitCache()
+    makers = [ExponentialFitter, ErlangFitter, lambda cache: HyperErlangFitter(peaks=2, cache=cache)] * 4
+    dists, _ = gof.compare_fitters(samples, {str(i): make(cache=cache) for i, make in enumerate(makers)})
+    for i, make in enumerate(makers):
+        assert dists[str(i)].mean == pytest.approx(make(cache=None).fit(samples).mean)
@@ -0,0 +1,32 @@
+import numpy as np
+import pytest
+from scipy import stats
+
+from hyperstarc import gof
+from hyperstarc.dist import Erlang, Exponential
+from hyperstarc.fitters import ErlangFitter, ExponentialFitter
+
+
+def test_evaluate_matches_scipy():
+    rng = np.random.default_rng(1)
+    samples = rng.gamma(3.0, 1 / 2.0, 2000)
+    dist = Erlang(rate=2.0, phase=3)
+    (res,) = gof.evaluate(samples, {"erlang": dist})
+    cdf = lambda x: stats.gamma.cdf(x, a=3, scale=0.5)
+    assert res.ks == pytest.approx(stats.kstest(samples, cdf).statistic)
+    assert res.llh == pytest.approx(np.sum(stats.gamma.logpdf(samples, a=3, scale=0.5)))
+    assert res.mean_err < 0.05
+    assert 0.0 <= res.hist_dist <= 1.0
+
+
+def test_compare_fitters_picks_erlang():
+    rng = np.random.default_rng(2)
+    samples = rng.gamma(5.0, 1 / 4.0, 5000)
+    fitters = {"Exponential": ExponentialFitter(), "Erlang": ErlangFitter()}
+    dists, results = gof.compare_fitters(samples, fitters)
+    assert set(dists) == {"Exponential", "Erlang"}
+    assert isinstance(dists["Exponential"], Exponential)
+    assert results[0].name == "Erlang"
+    assert results[0].ad < results[1].ad
+    rows = gof.to_rows(results)
+    assert len(rows[0]) == len(gof.REPORT_HEADERS)
@@ -0,0 +1,56 @@
+import itertools
+
+import numpy as np
+import pytest
+
+from hyperstarc.dist import HyperErlang
+from hyperstarc.phase_budget import PhaseBudgetFitter, top_allocations
+
+
+def test_top_allocations_matches_brute_force():
+    rng = np.random.default_rng(14)
+    table = rng.normal(size=(3, 6))
+    budget = 9
+    best = top_allocations(table, budget, size=5)
+    brute = sorted(
+        (
+            (sum(table[i, k - 1] for i, k in enumerate(alloc)), alloc)
+            for alloc in itertools.product(range(1, 7), repeat=3)
+            if sum(alloc) <= budget
+        ),
+        reverse=True,
+    )[:5]
+    assert [a for _, a in best] == [a for _, a in brute]
+    assert [s for s, _ in best] == pytest.approx([s for s, _ in brute])
+
+
+def test_top_allocations_binding_budget():
+    # five concave branches whose best phases together exceed the budget
+    k = np.arange(1, 9)
+    peaks = np.array([6, 7, 5, 8, 6])
+    table = -((k[None, :] - peaks[:, None]) ** 2) * np.array([1.0, 2.0, 0.5, 1.5, 3.0])[:, None]
+    budget = 20
+    best = top_allocations(table, budget, size=10)
+    brute = sorted(
+        (
+            (sum(table[i, k - 1] for i, k in enumerate(alloc)), alloc)
+            for alloc in itertools.product(range(1, 9), repeat=5)
+            if sum(alloc) <= budget
+        ),
+        reverse=True,
+    )[:10]
+    assert all(sum(a) == budget for _, a in best)
+    assert [s for s, _ in best] == pytest.approx([s for s, _ in brute])
+
+
+def test_budget_fit():
+    rng = np.random.default_rng(15)
+    samples = np.concatenate([rng.gamma(3.0, 0.1, 2000), rng.gamma(12.0, 0.25, 2000)])
+    fitter = PhaseBudgetFitter(budget=8, peaks=2)
+    dist = fitter.fit(samples)
+    assert isinstance(dist, HyperErlang)
+    assert dist.phase <= 8
+    assert fitter.ranking[0][0] >= fitter.ranking[-1][0]
+    assert dist.llh(samples) == pytest.approx(fitter.ranking[0][0])
+    with pytest.raises(ValueError):
+        PhaseBudgetFitter(budget=1, peaks=2)
@@ -0,0 +1,90 @@
+import numpy as np
+import pytest
+
+from hyperstarc import queueing
+from hyperstarc.dist import (MAP, Erlang, Exponential, HyperErlang,
+                             HyperErlangBranch)
+
+
+def test_mm1():
+    res = queueing.solve(Exponential(rate=1.0), Exponential(rate=2.0))
+    rho = 0.5
+    assert res.utilization == pytest.approx(rho)
+    n = np.arange(10)
+    assert res.queue_length[:10] == pytest.approx((1 - rho) * rho**n)
+    assert res.mean_queue_length == pytest.approx(1.0)
+    assert res.mean_waiting == pytest.approx(0.5)
+    assert res.waiting_moments[1] == pytest.approx(1.0)
+    assert res.mean_response == pytest.approx(1.0)
+    assert res.waiting_quantile(0.99) == pytest.approx(np.log(50), rel=1e-3)
+    assert res.waiting_quantile(0.3) == 0.0
+    assert res.queue_length_quantile(0.9) == 3
+
+
+def test_m_erlang_1_pollaczek_khinchine():
+    lam = 0.8
+    service = Erlang(rate=3.0, phase=3)
+    res = queueing.solve(Exponential(rate=lam), service)
+    rho = lam * service.mean
+    expected = lam * service.get_moment(2) / (2 * (1 - rho))
+    assert res.mean_waiting == pytest.approx(expected)
+    # Little's law
+    assert res.mean_queue_length == pytest.approx(lam * res.mean_response)
+
+
+def test_map_and_hyper_erlang():
+    d0 = np.array([[-5.0, 2.0], [1.0, -3.0]])
+    d1 = np.array([[3.0, 0.0], [0.0, 2.0]])
+    arrival = MAP(d0=d0, d1=d1)
+    service = HyperErlang(
+        [
+            HyperErlangBranch(Erlang(rate=20.0, phase=2), prob=0.5),
+            HyperErlangBranch(Erlang(rate=10.0, phase=3), prob=0.5),
+        ]
+    )
+    res = queueing.solve(arrival, service)
+    assert 0 < res.utilization < 1
+    assert res.queue_length.sum() == pytest.approx(1.0)
+    assert res.queue_length[0] == pytest.approx(1 - res.utilization)
+    assert res.mean_queue_length == pytest.approx(res.arrival_rate * res.mean_response)
+
+
+def test_gi_m1_erlang_arrivals():
+    # E_k/M/1: P(W > x) = sigma e^{-mu (1 - sigma) x} with
+    # sigma = (k lam / (k lam + mu (1 - sigma)))^k
+    k, lam, mu = 40, 0.9, 1.0
+    sigma = 0.5
+    for _ in range(1000):
+        sigma = (k * lam / (k * lam + mu * (1 - sigma))) ** k
+    res = queueing.solve(Erlang(rate=k * lam, phase=k), Exponential(rate=mu))
+    decay = mu * (1 - sigma)
+    assert res.waiting_time.phase == 1
+    assert res.mean_waiting == pytest.approx(sigma / decay)
+    assert res.waiting_quantile(0.99) == pytest.approx(np.log(100 * sigma) / decay, rel=1e-3)
+    assert res.mean_queue_length == pytest.approx(lam * res.mean_response)
+
+
+def test_large_ph_ph1():
+    arrival = HyperErlang(
+        [
+            HyperErlangBranch(Erlang(rate=30.0, phase=30), prob=0.6),
+            HyperErlangBranch(Erlang(rate=15.0, phase=30), prob=0.4),
+        ]
+    )
+    service = HyperErlang(
+        [
+            HyperErlangBranch(Erlang(rate=40.0, phase=20), prob=0.5),
+            HyperErlangBranch(Erlang(rate=25.0, phase=40), prob=0.5),
+        ]
+    )
+    res = queueing.solve(arrival, service)
+    assert res.utilization == pytest.approx(service.mean / arrival.mean)
+    assert res.waiting_time.phase == service.phase
+    assert res.queue_length.sum() == pytest.approx(1.0)
+    assert res.queue_length[0] == pytest.approx(1 - res.utilization)
+    assert res.mean_queue_length == pytest.approx(res.arrival_rate * res.mean_response)
+
+
+def test_unstable():
+    with pytest.raises(ValueError):
+        queueing.solve(Exponential(rate=2.0), Exponential(rate=1.0))
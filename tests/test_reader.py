@@ -0,0 +1,56 @@
+import gzip
+
+import numpy as np
+import pytest
+
+from hyperstarc import reader
+
+
+@pytest.fixture
+def small_chunks(monkeypatch):
+    monkeypatch.setattr(reader, "CHUNK_BYTES", 256)
+
+
+def _write(path, text, compressed=False):
+    if compressed:
+        with gzip.open(path, "wt") as f:
+            f.write(text)
+    else:
+        path.write_text(text)
+
+
+@pytest.mark.parametrize("compressed", [False, True])
+def test_read_chunks(tmp_path, small_chunks, compressed):
+    values = np.random.default_rng(16).random((500, 2))
+    lines = [f"{float(a)!r} {float(b)!r}" for a, b in values]
+    lines.insert(100, "# comment")
+    lines.insert(300, "")
+    path = tmp_path / "samples.txt"
+    _write(path, "\n".join(lines), compressed)
+    res = reader.read_text(path, workers=2)
+    assert res.shape == (500, 2)
+    assert np.array_equal(res, values)
+
+
+@pytest.mark.parametrize("compressed", [False, True])
+def test_error_line_number(tmp_path, small_chunks, compressed):
+    lines = [str(float(i)) for i in range(400)]
+    lines[321] = "12.5x"
+    path = tmp_path / "bad.txt"
+    _write(path, "\n".join(lines) + "\n", compressed)
+    with pytest.raises(reader.ParseError) as info:
+        reader.read_text(path, workers=2)
+    assert info.value.line == 322
+    assert "12.5x" in str(info.value)
+
+
+def test_csv_and_small_file(tmp_path):
+    path = tmp_path / "samples.csv"
+    path.write_text("1.0,2.0\n3.0,4.0\n")
+    delimiter = reader.sniff_delimiter(path)
+    assert delimiter == ","
+    assert reader.read_text(path, delimiter=delimiter).tolist() == [[1.0, 2.0], [3.0, 4.0]]
+    path.write_text("1.0 2.0\n3.0\n")
+    with pytest.raises(reader.ParseError) as info:
+        reader.read_text(path)
+    assert info.value.line == 2
@@ -0,0 +1,21 @@
+import numpy as np
+import pytest
+
+from hyperstarc.sam_handler import _read_samples
+
+
+@pytest.mark.parametrize(
+    "text, shape",
+    [
+        ("1.0\n2.0\n3.0\n", (3,)),
+        ("1.0 2.0 3.0 4.0\n", (4,)),
+        ("1.0,2.0,3.0\n", (3,)),
+        ("1.0 2.0\n3.0 4.0\n5.0 6.0\n", (3, 2)),
+    ],
+)
+def test_read_samples_shape(tmp_path, text, shape):
+    path = tmp_path / "samples.txt"
+    path.write_text(text)
+    samples = _read_samples(str(path))
+    assert samples.shape == shape
+    assert np.array_equal(np.ravel(samples), np.arange(1, samples.size + 1))
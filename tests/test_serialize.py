@@ -0,0 +1,90 @@
+import numpy as np
+import pytest
+from scipy.stats import erlang
+
+from hyperstarc import serialize
+from hyperstarc.dist import (MAP, Erlang, Exponential, HyperErlang,
+                             HyperErlangBranch, PhaseType)
+from hyperstarc.dist_batch import DistBatch
+
+
+def _models():
+    her = HyperErlang(
+        [
+            HyperErlangBranch(Erlang(rate=1.0, phase=1), prob=0.4),
+            HyperErlangBranch(Erlang(rate=2.0, phase=3), prob=0.6),
+        ]
+    )
+    d0 = np.array([[-5.0, 2.0], [1.0, -3.0]])
+    d1 = np.array([[3.0, 0.0], [0.0, 2.0]])
+    return {
+        "exp": Exponential(rate=2.0),
+        "erl": Erlang(rate=3.0, phase=4),
+        "her": her,
+        "map": MAP(d0=d0, d1=d1),
+        "ph": PhaseType(np.array([0.5, 0.5]), d0),
+    }
+
+
+def test_round_trip():
+    for dist in _models().values():
+        loaded = serialize.loads(serialize.dumps(dist))
+        assert type(loaded) is type(dist)
+        assert loaded.cdf(0.7) == pytest.approx(dist.cdf(0.7))
+
+
+def test_unsupported_version():
+    text = serialize.dumps(Exponential(rate=1.0)).replace('"version": 1', '"version": 99')
+    with pytest.raises(ValueError):
+        serialize.loads(text)
+
+
+@pytest.mark.parametrize("suffix", [".json", ".npz"])
+def test_save_load_models(tmp_path, suffix):
+    models = _models()
+    path = tmp_path / f"models{suffix}"
+    serialize.save_models(path, models)
+    loaded = serialize.load_models(path)
+    assert list(loaded) == list(models)
+    for key, dist in models.items():
+        assert loaded[key].pdf(0.5) == pytest.approx(dist.pdf(0.5))
+    batch = serialize.load_batch(path)
+    assert batch.ids == list(models)
+
+
+def test_npz_members_read_once(tmp_path, monkeypatch):
+    models = {f"{key}{i}": dist for i in range(20) for key, dist in _models().items()}
+    path = tmp_path / "models.npz"
+    serialize.save_models(path, models)
+    reads: dict[str, int] = {}
+    getitem = np.lib.npyio.NpzFile.__getitem__
+
+    def counting(self, key):
+        reads[key] = reads.get(key, 0) + 1
+        return getitem(self, key)
+
+    monkeypatch.setattr(np.lib.npyio.NpzFile, "__getitem__", counting)
+    batch = serialize.load_batch(path)
+    assert batch.ids == list(models)
+    assert max(reads.values()) == 1
+
+
+def test_batch_evaluation():
+    models = _models()
+    batch = DistBatch.from_dists(models)
+    x = np.linspace(0.0, 3.0, 7)
+    pdf = batch.pdf(x)
+    cdf = batch.cdf(x)
+    assert pdf.shape == cdf.shape == (len(models), x.size)
+    for row, dist in enumerate(models.values()):
+        assert pdf[row] == pytest.approx([dist.pdf(v) for v in x])
+        assert cdf[row] == pytest.approx([dist.cdf(v) for v in x])
+    assert batch.mean()[:3] == pytest.approx([0.5, 4 / 3.0, 0.4 + 0.6 * 1.5])
+
+
+def test_batch_quantile():
+    batch = DistBatch.from_dists([Erlang(rate=3.0, phase=4), Exponential(rate=2.0)])
+    q = np.array([0.5, 0.99])
+    res = batch.quantile(q)
+    assert res[0] == pytest.approx(erlang.ppf(q, a=4, scale=1 / 3.0))
+    assert res[1] == pytest.approx(-np.log(1 - q) / 2.0)
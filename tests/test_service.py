@@ -0,0 +1,119 @@
+import json
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+
+from hyperstarc import serialize, service
+from hyperstarc.dist import Erlang
+from hyperstarc.service import FitServer
+
+
+@pytest.fixture
+def server():
+    server = FitServer(port=0)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def _call(server, method, path, body=None):
+    data = None if body is None else json.dumps(body).encode()
+    req = urllib.request.Request(server.url + path, data=data, method=method)
+    req.add_header("Content-Type", "application/json")
+    try:
+        with urllib.request.urlopen(req, timeout=30) as res:
+            return res.status, json.loads(res.read())
+    except urllib.error.HTTPError as e:
+        return e.code, json.loads(e.read())
+
+
+def test_fit_and_evaluate(server):
+    samples = np.random.default_rng(0).gamma(3, 0.5, 5000)
+    status, res = _call(
+        server,
+        "POST",
+        "/fit",
+        {"samples": samples.tolist(), "fitter": "Erlang", "params": {"erlang_rounding": "exact"}},
+    )
+    assert status == 200
+    dist = serialize.from_dict(res["model"])
+    assert isinstance(dist, Erlang)
+    model_id = res["id"]
+    assert _call(server, "GET", f"/models/{model_id}")[1]["model"] == res["model"]
+
+    x = [0.5, 1.0, 2.0]
+    for kind, expected in [("pdf", dist.pdfs(np.array(x))), ("cdf", dist.cdfs(np.array(x)))]:
+        status, res = _call(server, "POST", f"/models/{model_id}/evaluate", {"kind": kind, "x": x})
+        assert status == 200
+        np.testing.assert_allclose(res["values"], expected)
+    status, res = _call(server, "POST", f"/models/{model_id}/evaluate", {"kind": "quantile", "x": [0.5]})
+    assert dist.cdf(res["values"][0]) == pytest.approx(0.5)
+
+    status, res = _call(server, "POST", f"/models/{model_id}/score", {"samples": samples.tolist()})
+    assert status == 200
+    assert res["ks"] < 0.05
+
+
+def test_concurrent_evaluate_is_coalesced(server, monkeypatch):
+    _, res = _call(server, "POST", "/models", {"model": serialize.to_dict(Erlang(2.0, 3))})
+    model_id = res["id"]
+    grids = [np.linspace(0.1, 5, 50) + i for i in range(16)]
+
+    # the first evaluation waits until every other request is queued
+    release = threading.Event()
+    evaluate_batch = service._evaluate
+
+    def blocking(batch, kind, x):
+        release.wait(30)
+        return evaluate_batch(batch, kind, x)
+
+    monkeypatch.setattr(service, "_evaluate", blocking)
+
+    def evaluate(grid):
+        return _call(server, "POST", f"/models/{model_id}/evaluate", {"kind": "cdf", "x": grid.tolist()})
+
+    coalescer = server.service.coalescer
+    with ThreadPoolExecutor(max_workers=len(grids)) as pool:
+        futures = [pool.submit(evaluate, grid) for grid in grids]
+        for _ in range(3000):
+            if len(coalescer._pending.get((model_id, "cdf"), [])) == len(grids) - 1:
+                break
+            time.sleep(0.01)
+        release.set()
+        results = [f.result() for f in futures]
+    dist = Erlang(2.0, 3)
+    for grid, (status, res) in zip(grids, results):
+        assert status == 200
+        np.testing.assert_allclose(res["values"], dist.cdfs(grid))
+
+    _, metrics = _call(server, "GET", "/metrics")
+    coalescing = metrics["coalescing"]
+    assert coalescing["requests"] == len(grids)
+    assert coalescing["batches"] == 2
+    assert coalescing["batches"] < coalescing["requests"]
+    assert coalescing["points"] == 50 * len(grids)
+    assert metrics["routes"]["evaluate"]["requests"] == len(grids)
+    assert metrics["routes"]["evaluate"]["latency_ms"]["p99"] > 0
+
+
+def test_errors(server):
+    assert _call(server, "GET", "/models/missing")[0] == 404
+    assert _call(server, "POST", "/nothing", {})[0] == 404
+    assert _call(server, "POST", "/fit", {"samples": [], "fitter": "Erlang"})[0] == 400
+    assert _call(server, "POST", "/fit", {"samples": [1.0], "fitter": "Gamma"})[0] == 400
+    assert _call(server, "POST", "/fit", {"samples": [1.0], "params": {"rate": 1}})[0] == 400
+    _, res = _call(server, "POST", "/models", {"model": serialize.to_dict(Erlang(1.0, 2))})
+    path = f"/models/{res['id']}"
+    assert _call(server, "POST", path + "/evaluate", {"kind": "quantile", "x": [1.5]})[0] == 400
+    assert _call(server, "POST", path + "/evaluate", {"kind": "mean", "x": [1.0]})[0] == 400
+    assert _call(server, "DELETE", path)[0] == 200
+    assert _call(server, "GET", path)[0] == 404
+    _, metrics = _call(server, "GET", "/metrics")
+    assert metrics["routes"]["fit"]["errors"] == 3
@@ -0,0 +1,52 @@
+import numpy as np
+import pytest
+
+from hyperstarc.config import ERMD
+from hyperstarc.fitters import ErlangFitter, ExponentialFitter
+from hyperstarc.window_fit import fit_time_windows, fit_windows
+
+
+@pytest.mark.parametrize(
+    "fitter", [ExponentialFitter(), ErlangFitter(method=ERMD.MLE), ErlangFitter(method=ERMD.MOM)]
+)
+def test_windows_match_direct_fits(fitter):
+    rng = np.random.default_rng(7)
+    trace = np.concatenate([rng.gamma(2.0, 0.5, 500), rng.gamma(6.0, 0.1, 500)])
+    fits = fit_windows(trace, window=200, stride=50, fitter=fitter)
+    assert fits.starts.tolist() == list(range(0, 801, 50))
+    for start, rate, phase in zip(fits.starts, fits.rate, fits.phase):
+        dist = fitter.fit(trace[start : start + 200])
+        assert rate == pytest.approx(dist.rate)
+        assert phase == getattr(dist, "phase", 1)
+
+
+def test_time_windows():
+    trace = np.full(100, 0.5)
+    fits = fit_time_windows(trace, duration=10.0, stride=5.0, fitter=ExponentialFitter())
+    assert fits.rate == pytest.approx(2.0)
+    assert set(fits.count.tolist()) <= {19, 20}
+
+
+def test_bad_window():
+    with pytest.raises(ValueError):
+        fit_windows(np.ones(10), window=20, stride=1, fitter=ExponentialFitter())
+
+
+def test_many_windows():
+    trace = np.random.default_rng(8).exponential(1.0, 1_000_000)
+    fits = fit_windows(trace, window=1000, stride=10, fitter=ErlangFitter())
+    assert fits.rate.size == 99_901
+
+
+def test_zero_gap_only_affects_its_windows():
+    trace = np.random.default_rng(9).gamma(3.0, 1.0, 2000)
+    trace[10] = 0.0
+    fitter = ErlangFitter()
+    fits = fit_windows(trace, window=200, stride=100, fitter=fitter)
+    for start, rate, phase in zip(fits.starts, fits.rate, fits.phase):
+        if start > 10:
+            dist = fitter.fit(trace[start : start + 200])
+            assert rate == pytest.approx(dist.rate)
+            assert phase == dist.phase
+        else:
+            assert phase == 1